@@ -1,21 +1,35 @@
 # backend/main.py
+import time
+IMPORT_STARTED = time.perf_counter() # cold-start clock (reported by /ready)
+
 import os
 import shutil
+import asyncio
 import speech_recognition as sr
 from pydub import AudioSegment
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from urllib.parse import quote
 import io
 import json 
-import ffmpeg 
 from services.subtitle_gen import generate_subtitles
 
 # --- IMPORT CUSTOM SERVICES -----
-from services.ai_agent import analyze_command
+from services.ai_agent import analyze_command, prefetch_video, plan_cache_stats
 from services.video_engine import process_video, stitch_videos
-from services.voice_gen import generate_voice_reply 
-from services.sfx_gen import generate_sound_effect
+from services.segment_cache import segment_cache_stats
+from services.render_pool import render_stats
+from services.render_jobs import JobManager
+from services.stream_stt import StreamingTranscriber
+from services.audio_cache import get_pcm, waveform_peaks, loudness
+from services.voice_gen import generate_voice_reply, cached_voice_reply, stream_voice_reply, tts_cache_stats
+from services.sfx_gen import get_sound_effect, sfx_cache_stats
+from services.registry import registry, warmup_targets
+from services.upload_store import save_upload, upload_info
+from services.media_info import get_media_info, prefetch_media_info, media_info_stats
+from services.timeline import resolve_media
 
 app = FastAPI()
 
@@ -28,13 +42,31 @@ app.add_middleware(
 )
 
 UPLOAD_DIR = "temp_storage"
+# Start the Gemini upload as soon as a file lands, before the first command arrives
+PREFETCH_UPLOADS = os.getenv("VOXEDIT_PREFETCH_UPLOADS", "1") == "1"
+# After a preview render, start the full-quality render as a background job right away
+PREVIEW_FULL_RENDER = os.getenv("VOXEDIT_PREVIEW_FULL_RENDER", "1") == "1"
+# Hand out a streaming URL for uncached voice replies instead of waiting for the whole MP3
+STREAM_TTS = os.getenv("VOXEDIT_STREAM_TTS", "1") == "1"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/files", StaticFiles(directory=UPLOAD_DIR), name="files")
+
+
+class PublicFiles(StaticFiles):
+    """
+    /files without the hidden working dirs kept next to the media (.incoming, .segments, .index).
+    """
+    async def get_response(self, path: str, scope):
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+app.mount("/files", PublicFiles(directory=UPLOAD_DIR), name="files")
 
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        self.job_watchers: dict[str, set] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -43,6 +75,14 @@ class ConnectionManager:
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        for watchers in self.job_watchers.values():
+            watchers.discard(websocket)
+
+    def watch(self, websocket: WebSocket, job_id: str):
+        self.job_watchers.setdefault(job_id, set()).add(websocket)
+
+    def unwatch(self, websocket: WebSocket, job_id: str):
+        self.job_watchers.get(job_id, set()).discard(websocket)
 
     async def broadcast(self, message: dict):
         # Iterate over a copy to safely remove dead connections
@@ -52,15 +92,40 @@ class ConnectionManager:
             except Exception:
                 self.disconnect(connection)
 
+    async def send_job_update(self, job: dict):
+        # Only clients that asked to watch this job get its progress
+        message = {"type": "job", **job}
+        for connection in list(self.job_watchers.get(job["job_id"], ())):
+            try:
+                await connection.send_json(message)
+            except Exception:
+                self.disconnect(connection)
+        if job["state"] in ("done", "failed"):
+            self.job_watchers.pop(job["job_id"], None)
+
 manager = ConnectionManager()
+jobs = JobManager(notify=manager.send_job_update)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            # Keep the connection alive
-            await websocket.receive_text()
+            # Keep the connection alive; clients may also send {"type": "watch", "job_id": ...}
+            raw = await websocket.receive_text()
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(msg, dict) or not msg.get("job_id"):
+                continue
+            if msg.get("type") == "watch":
+                manager.watch(websocket, msg["job_id"])
+                job = jobs.get(msg["job_id"])
+                if job:
+                    await websocket.send_json({"type": "job", **job.to_dict()})
+            elif msg.get("type") == "unwatch":
+                manager.unwatch(websocket, msg["job_id"])
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception:
@@ -70,21 +135,47 @@ async def websocket_endpoint(websocket: WebSocket):
 # --- 1. UPLOAD ENDPOINT ---
 @app.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"filename": file.filename, "url": f"http://localhost:8000/files/{file.filename}"}
+    # Stored as "<sha256>.<ext>": no overwrites between same-named files, one copy of identical media
+    stored = await save_upload(file, UPLOAD_DIR)
+    filename = stored["filename"]
+    # Probe + keyframe scan once now; every later edit / render reads them from the index
+    prefetch_media_info(os.path.join(UPLOAD_DIR, filename))
+
+    if PREFETCH_UPLOADS and (file.content_type or "").startswith("video"):
+        prefetch_video(filename)
+    return {
+        "filename": filename,
+        "url": f"http://localhost:8000/files/{filename}",
+        "name": stored["name"],
+        "digest": stored["digest"],
+        "deduplicated": stored["deduplicated"],
+    }
+
+@app.get("/uploads/{filename}")
+async def upload_details(filename: str):
+    info = await asyncio.to_thread(upload_info, filename)
+    if not info: raise HTTPException(status_code=404, detail="Unknown upload")
+    return {"status": "success", "filename": filename, **info}
+
+@app.get("/media-info/{filename:path}")
+async def media_info_endpoint(filename: str, keyframes: bool = False):
+    path = resolve_media({"filename": filename}, UPLOAD_DIR)
+    if not path: raise HTTPException(status_code=404, detail="File not found")
+    try:
+        info = await get_media_info(path, keyframes=keyframes)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Unreadable media: {e}")
+    return {"status": "success", "filename": filename, **info}
 
 # --- 2. TEXT EDIT ENDPOINT ---
-@app.post("/edit")
-async def edit_video(
-    command: str = Form(...), 
-    filename: str = Form(...),
-    clip_start: float = Form(0.0),
-    clip_duration: float = Form(None)
-):
-    print(f"🎬 EDIT REQUEST: '{command}'")
-    
+async def run_edit(command: str, filename: str, clip_start: float, clip_duration: float, on_progress=None,
+                   preview: bool = False):
+    """
+    The full edit pipeline (AI plan + FFmpeg render). Shared by the blocking
+    and the background (job) flavour of /edit.
+    With `preview`, renders a quick low-resolution version first and (if enabled)
+    queues the full-quality render as a job.
+    """
     # 🧠 Broadcast: Start
     await manager.broadcast({"type": "log", "level": "info", "message": f"Incoming command: '{command}'"})
     
@@ -120,7 +211,7 @@ async def edit_video(
     print(f"   ⚙️ Executing {len(actions)} actions...")
     await manager.broadcast({"type": "log", "level": "analysis", "message": "Rendering video effects (FFmpeg)..."})
     
-    result = await process_video(input_path, actions, clip_start, clip_duration)
+    result = await process_video(input_path, actions, clip_start, clip_duration, on_progress=on_progress, preview=preview)
     
     if not result:
         await manager.broadcast({"type": "log", "level": "error", "message": "Processing failed."})
@@ -129,17 +220,56 @@ async def edit_video(
     new_filename = os.path.basename(result["path"])
     
     # 🧠 Broadcast: Success
-    await manager.broadcast({"type": "log", "level": "success", "message": "Video rendering complete."})
+    await manager.broadcast({"type": "log", "level": "success", "message": "Preview ready." if preview else "Video rendering complete."})
     await manager.broadcast({"type": "stats", "tokens": 145, "latency": 850}) 
 
-    return {
+    response = {
         "status": "success",
         "processed_url": f"http://localhost:8000/files/{new_filename}",
         "new_duration": result["duration"],
         "explanation": explanation,
-        "actions": actions
+        "actions": actions,
+        "preview": preview
     }
 
+    # Full quality follows in the background; the plan is reused, not asked for again
+    if preview and PREVIEW_FULL_RENDER:
+        async def full_render(job):
+            full = await process_video(input_path, actions, clip_start, clip_duration,
+                                       on_progress=lambda stats: jobs.report(job, stats))
+            if not full: raise RuntimeError("Processing failed")
+            return {"processed_url": f"http://localhost:8000/files/{os.path.basename(full['path'])}",
+                    "new_duration": full["duration"]}
+
+        response["full_render_job_id"] = jobs.submit("edit", full_render).id
+
+    return response
+
+@app.post("/edit")
+async def edit_video(
+    command: str = Form(...), 
+    filename: str = Form(...),
+    clip_start: float = Form(0.0),
+    clip_duration: float = Form(None),
+    background: bool = Form(False),
+    preview: bool = Form(False)
+):
+    print(f"🎬 EDIT REQUEST: '{command}'")
+
+    # Background mode: hand back a job id now, stream progress over /ws
+    if background:
+        if not os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            raise HTTPException(status_code=404, detail="File not found")
+
+        async def work(job):
+            return await run_edit(command, filename, clip_start, clip_duration,
+                                  on_progress=lambda stats: jobs.report(job, stats), preview=preview)
+
+        job = jobs.submit("edit", work)
+        return {"status": "queued", "job_id": job.id}
+
+    return await run_edit(command, filename, clip_start, clip_duration, preview=preview)
+
 # --- 3. VOICE COMMAND ENDPOINT ---
 @app.post("/voice-command")
 async def voice_command(
@@ -184,14 +314,34 @@ async def voice_command(
         actions = ai_plan.get("segments_to_keep", ai_plan.get("actions", []))
         explanation = ai_plan.get("explanation", "Processed successfully.")
 
-        # D. Generate Voice Reply
-        print(f"   🎙️ Generating Reply...")
-        await manager.broadcast({"type": "log", "level": "info", "message": "Synthesizing voice response..."})
-        voice_reply_path = generate_voice_reply(explanation)
-        voice_reply_url = None
-        if voice_reply_path:
-            voice_filename = os.path.basename(voice_reply_path)
-            voice_reply_url = f"http://localhost:8000/files/{voice_filename}"
+        # D + E. Voice reply and video render don't depend on each other: run them together
+        async def synthesize_reply():
+            print(f"   🎙️ Generating Reply...")
+            await manager.broadcast({"type": "log", "level": "info", "message": "Synthesizing voice response..."})
+            if STREAM_TTS:
+                # Cached -> static file; otherwise the client plays chunks as ElevenLabs sends them
+                voice_reply_path = await asyncio.to_thread(cached_voice_reply, explanation)
+                if voice_reply_path:
+                    voice_reply_url = f"http://localhost:8000/files/{os.path.basename(voice_reply_path)}"
+                else:
+                    voice_reply_url = f"http://localhost:8000/voice-reply/stream?text={quote(explanation)}"
+            else:
+                voice_reply_path = await asyncio.to_thread(generate_voice_reply, explanation)
+                if not voice_reply_path:
+                    return None
+                voice_reply_url = f"http://localhost:8000/files/{os.path.basename(voice_reply_path)}"
+            # Push it right away so the client can start talking while FFmpeg is still busy
+            await manager.broadcast({"type": "voice_reply", "url": voice_reply_url, "transcription": text_command})
+            return voice_reply_url
+
+        async def render_edit():
+            if not actions:
+                return None
+            input_path = os.path.join(UPLOAD_DIR, filename)
+            await manager.broadcast({"type": "log", "level": "analysis", "message": "Executing video edits..."})
+            return await process_video(input_path, actions, clip_start, clip_duration)
+
+        voice_reply_url, result = await asyncio.gather(synthesize_reply(), render_edit())
 
         response_data = {
             "status": "success",
@@ -203,16 +353,11 @@ async def voice_command(
             "actions": actions
         }
 
-        # E. Process Video
-        if actions:
-            input_path = os.path.join(UPLOAD_DIR, filename)
-            await manager.broadcast({"type": "log", "level": "analysis", "message": "Executing video edits..."})
-            result = await process_video(input_path, actions, clip_start, clip_duration)
-            if result:
-                new_filename = os.path.basename(result["path"])
-                response_data["processed_url"] = f"http://localhost:8000/files/{new_filename}"
-                response_data["new_duration"] = result["duration"]
-                await manager.broadcast({"type": "log", "level": "success", "message": "Actions applied successfully."})
+        if result:
+            new_filename = os.path.basename(result["path"])
+            response_data["processed_url"] = f"http://localhost:8000/files/{new_filename}"
+            response_data["new_duration"] = result["duration"]
+            await manager.broadcast({"type": "log", "level": "success", "message": "Actions applied successfully."})
 
         return response_data
 
@@ -220,9 +365,100 @@ async def voice_command(
         print(f"Voice Error: {e}")
         return {"status": "error", "message": str(e)}
 
+# --- 3a. STREAMING VOICE REPLY (chunked MP3) ---
+@app.get("/voice-reply/stream")
+async def voice_reply_stream(text: str):
+    if not text.strip(): raise HTTPException(status_code=400, detail="Empty text")
+
+    # Pull the first chunk before answering, so an API failure is still a proper error status
+    chunks = stream_voice_reply(text)
+    try:
+        first = await asyncio.to_thread(next, chunks, b"")
+    except Exception as e:
+        print(f" ElevenLabs Error: {e}")
+        raise HTTPException(status_code=502, detail="Voice synthesis failed")
+
+    def body():
+        yield first
+        yield from chunks
+
+    return StreamingResponse(body(), media_type="audio/mpeg", headers={"Cache-Control": "no-store"})
+
+# --- 3b. STREAMING VOICE COMMAND (WebSocket) ---
+@app.websocket("/ws/voice")
+async def voice_command_stream(websocket: WebSocket):
+    """
+    Local streaming speech recognition.
+    Client -> server: optional {"type": "start", "filename", "clip_start", "clip_duration", "execute"},
+                      then binary frames of 16 kHz mono int16 PCM, optionally {"type": "stop"}.
+    Server -> client: {"type": "partial", "text"} while talking, {"type": "final", "text"} at the endpoint,
+                      and {"type": "result", ...} (same shape as /edit) when "execute" is set.
+    """
+    await websocket.accept()
+    session = {}
+    stt = StreamingTranscriber()
+
+    async def send_partial(text):
+        await websocket.send_json({"type": "partial", "text": text})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            ended = False
+            if message.get("bytes"):
+                ended = stt.feed(message["bytes"])
+                if not ended and stt.partial_due():
+                    stt.start_partial(send_partial)
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "start":
+                    session = control
+                    stt = StreamingTranscriber()
+                ended = control.get("type") == "stop"
+
+            if not ended:
+                continue
+
+            text_command = await stt.finish()
+            stt = StreamingTranscriber()
+            await websocket.send_json({"type": "final", "text": text_command})
+            if not text_command:
+                continue
+
+            print(f"🗣️ Transcribed (stream): '{text_command}'")
+            await manager.broadcast({"type": "log", "level": "success", "message": f"Identified intent: '{text_command}'"})
+
+            if session.get("execute") and session.get("filename"):
+                try:
+                    result = await run_edit(text_command, session["filename"],
+                                            float(session.get("clip_start") or 0.0), session.get("clip_duration"))
+                except HTTPException as e:
+                    result = {"status": "error", "message": e.detail}
+                await websocket.send_json({"type": "result", "transcription": text_command, **result})
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Voice Stream Error: {e}")
+
 # --- 4. RENDER ENDPOINT ---
+async def run_render(clips: list, on_progress=None):
+    output_path = await stitch_videos(clips, on_progress=on_progress)
+    if not output_path: raise HTTPException(status_code=500, detail="Render failed")
+
+    new_filename = os.path.basename(output_path)
+    prefetch_media_info(output_path)
+    await manager.broadcast({"type": "log", "level": "success", "message": "Render Complete."})
+    return {"status": "success", "url": f"http://localhost:8000/files/{new_filename}"}
+
 @app.post("/render")
-async def render_project(project_data: str = Form(...)):
+async def render_project(project_data: str = Form(...), background: bool = Form(False)):
     print("🎬 Received Render Request...")
     # Optional: Broadcast render start
     await manager.broadcast({"type": "log", "level": "info", "message": "Starting final project render..."})
@@ -231,30 +467,35 @@ async def render_project(project_data: str = Form(...)):
         clips = json.loads(project_data)
         if not clips: return {"status": "error", "message": "No clips to render"}
 
-        output_path = await stitch_videos(clips)
-        if not output_path: raise HTTPException(status_code=500, detail="Render failed")
+        if background:
+            job = jobs.submit("render", lambda job: run_render(
+                clips, on_progress=lambda stats: jobs.report(job, stats)))
+            return {"status": "queued", "job_id": job.id}
 
-        new_filename = os.path.basename(output_path)
-        await manager.broadcast({"type": "log", "level": "success", "message": "Render Complete."})
-        return {"status": "success", "url": f"http://localhost:8000/files/{new_filename}"}
+        return await run_render(clips)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# --- 4b. JOB STATUS ENDPOINT ---
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "success", **job.to_dict()}
+
 # --- 5. SFX ENDPOINT ---
 @app.post("/generate-sfx")
 async def generate_sfx_endpoint(text: str = Form(...), duration: int = Form(None)):
     print(f"✨ Generating SFX: '{text}'")
     await manager.broadcast({"type": "log", "level": "info", "message": f"Generating SFX: '{text}'"})
     
-    output_path = generate_sound_effect(text, duration)
-    if not output_path: raise HTTPException(status_code=500, detail="SFX Failed")
+    # Cached / coalesced; the SDK call runs in a thread and the duration comes with the result
+    sfx = await get_sound_effect(text, duration)
+    if not sfx: raise HTTPException(status_code=500, detail="SFX Failed")
 
-    filename = os.path.basename(output_path)
-    try:
-        probe = ffmpeg.probe(output_path)
-        dur = float(probe['format']['duration'])
-    except:
-        dur = 3.0
+    # Synthesized fallbacks are shared cache files in a subfolder of the served directory
+    filename = os.path.relpath(sfx["path"], UPLOAD_DIR).replace(os.sep, "/")
+    dur = sfx["duration"]
 
     await manager.broadcast({"type": "log", "level": "success", "message": "SFX Generation Complete."})
     return {"status": "success", "url": f"http://localhost:8000/files/{filename}", "duration": dur, "name": text}
@@ -265,12 +506,83 @@ async def generate_subtitles_endpoint(filename: str = Form(...)):
     print(f"📝 Generating Subtitles for: {filename}")
     await manager.broadcast({"type": "log", "level": "info", "message": "Analyzing audio for subtitles..."})
     
-    subtitles = generate_subtitles(filename)
+    input_path = os.path.join(UPLOAD_DIR, filename)
+    if not os.path.exists(input_path): raise HTTPException(status_code=404, detail="File not found")
+
+    # Shared decoded audio: later waveform / silence / index calls reuse the same artifact
+    try:
+        audio = await get_pcm(input_path)
+    except Exception as e:
+        print(f"❌ Audio extraction failed: {e}")
+        raise HTTPException(status_code=500, detail="Audio extraction failed")
+    subtitles = await asyncio.to_thread(generate_subtitles, filename, audio)
     if subtitles is None: raise HTTPException(status_code=500, detail="Subtitle generation failed")
     
     await manager.broadcast({"type": "log", "level": "success", "message": "Subtitles generated."})
     return {"status": "success", "subtitles": subtitles}
 
+# --- 6b. WAVEFORM + LOUDNESS ---
+@app.get("/waveform/{filename}")
+async def waveform_endpoint(filename: str, points: int = 1000):
+    input_path = os.path.join(UPLOAD_DIR, filename)
+    if not os.path.exists(input_path): raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        samples = await get_pcm(input_path)
+    except Exception as e:
+        print(f"❌ Audio extraction failed: {e}")
+        raise HTTPException(status_code=500, detail="Audio extraction failed")
+    peaks, level = await asyncio.gather(
+        asyncio.to_thread(waveform_peaks, samples, max(1, min(points, 20000))),
+        asyncio.to_thread(loudness, samples),
+    )
+    return {"status": "success", "waveform": peaks, "loudness": level}
+
+# --- 7. RENDER QUEUE STATUS ---
+@app.get("/render-queue")
+async def render_queue_status():
+    return {"status": "success", **render_stats()}
+
+# --- 8. CACHE METRICS ---
+@app.get("/metrics")
+async def metrics():
+    return {
+        "status": "success",
+        "render_queue": render_stats(),
+        "plan_cache": plan_cache_stats(),
+        "segment_cache": segment_cache_stats(),
+        "tts_cache": tts_cache_stats(),
+        "sfx_cache": sfx_cache_stats(),
+        "media_info": media_info_stats(),
+    }
+
+# --- 9. READINESS ---
+STARTUP = {"import_seconds": None, "ready_seconds": None}
+WARMUP_NAMES = warmup_targets()
+
+@app.on_event("startup")
+async def startup():
+    STARTUP["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"🚀 Server up in {STARTUP['import_seconds']}s")
+
+    # Heavy models / clients load lazily; optionally get them ready in the background
+    async def warm():
+        await registry.warm(WARMUP_NAMES)
+        STARTUP["ready_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+        print(f"🔥 Warm-up done in {STARTUP['ready_seconds']}s ({', '.join(WARMUP_NAMES)})")
+
+    if WARMUP_NAMES:
+        app.state.warmup = asyncio.create_task(warm()) # keep a reference so it is not collected
+    else:
+        STARTUP["ready_seconds"] = STARTUP["import_seconds"]
+
+@app.get("/ready")
+async def ready():
+    # 503 until every service named in VOXEDIT_WARMUP has loaded (others load on first use)
+    is_ready = all(registry.loaded(name) for name in WARMUP_NAMES)
+    body = {"ready": is_ready, "warmup": WARMUP_NAMES, "startup": STARTUP, "services": registry.status()}
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
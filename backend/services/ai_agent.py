@@ -1,24 +1,35 @@
 # backend/services/ai_agent.py
 
 import os
+import re
 import json
 import asyncio
 import time
+import hashlib
 from dotenv import load_dotenv
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from services.gemini_cache import GeminiFileCache
+from services.content_hash import file_digest
+from services.disk_cache import DiskCache
+from services.analysis_proxy import get_analysis_proxy
+from services.media_index import get_media_index, format_index_for_prompt
+from services.silence_engine import is_silence_command, remove_silence_plan
+from services.registry import get_gemini
+from services.segment_cache import normalize_chain
 
 # Load env variables
 load_dotenv(override=True)
 
-API_KEY = os.getenv("GEMINI_API_KEY")
 TEMP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp_storage")
 
-if not API_KEY:
-    raise RuntimeError("❌ GEMINI_API_KEY not found in .env")
+# The Gemini client is imported and configured on first use by the service registry,
+# so a missing GEMINI_API_KEY fails AI requests instead of server startup, and importing
+# this module doesn't pay for the google SDK.
+class _LazyGemini:
+    """`google.generativeai`, loaded through the registry on first attribute access."""
+    def __getattr__(self, name):
+        return getattr(get_gemini(), name)
 
-# Initialize Gemini client via API
-genai.configure(api_key=API_KEY)
+genai = _LazyGemini()
 
 # --- CONFIGURATION ---
 PRIMARY_MODEL = "gemini-3-pro-preview"  # Fast, multimodal, latest
@@ -46,6 +57,11 @@ Your goal is to translate natural language commands into precise, executable FFm
 3. **Impossible Requests**: If the user asks for something not in the video (e.g., "Show the dinosaur" but there is no dinosaur), return an empty segment list and explain why.
 4. **Precision**: Use floats for timestamps (e.g., 12.45). Start must always be less than End.
 5. **Context**: If the command is vague (e.g., "Fix it"), assume standard cleanup (remove long silences, improve contrast).
+6. **Per-Segment Effects** (optional): when the user wants an effect on part of the video only
+   (e.g. "speed up the boring middle"), give that segment an `"actions"` list:
+   - `{"tool": "speed", "params": {"factor": 1.5}}` (factor 0.25-4.0)
+   - `{"tool": "filter", "params": {"type": "grayscale"}}` (types: "grayscale", "sepia", "warm")
+   Omit `"actions"` on segments that stay unchanged.
 
 ### OUTPUT FORMAT (STRICT JSON):
 Return ONLY this JSON object. No markdown.
@@ -53,7 +69,8 @@ Return ONLY this JSON object. No markdown.
   "explanation": "I found 3 segments where you were speaking and removed the long pauses.",
   "segments_to_keep": [
     { "start": 0.0, "end": 4.5, "label": "Intro speech" },
-    { "start": 8.2, "end": 15.0, "label": "Main point" }
+    { "start": 8.2, "end": 15.0, "label": "Main point" },
+    { "start": 15.0, "end": 40.0, "label": "Demo", "actions": [{"tool": "speed", "params": {"factor": 2.0}}] }
   ],
   "global_effects": {
     "speed": 1.0, 
@@ -62,9 +79,85 @@ Return ONLY this JSON object. No markdown.
 }
 """
 
+# Handle plain silence-removal commands locally instead of asking the model
+USE_LOCAL_SILENCE = os.getenv("VOXEDIT_LOCAL_SILENCE", "1") == "1"
+
+# --- CONTEXT MODE ---
+# "auto" sends a text index for commands answerable from speech/silence/scene cuts,
+# and the video only when the command needs visuals. "video" / "index" force a mode.
+CONTEXT_MODE = os.getenv("VOXEDIT_CONTEXT_MODE", "auto")
+
+VISUAL_HINTS = re.compile(
+    r"\b(see|seen|visible|show(s|n|ing)?|appear(s|ing)?|look(s|ing)?|wave|waving|wear(s|ing)?|"
+    r"hold(s|ing)?|color|colour|red|blue|green|yellow|black|white|face|smile|logo|product|"
+    r"screen|object|person|car|mug|bright|dark|camera|frame)\b",
+    re.IGNORECASE,
+)
+TEXT_HINTS = re.compile(
+    r"\b(silen(ce|t)|pauses?|quiet|dead air|say(s|ing)?|said|word(s)?|mention(s|ed)?|"
+    r"talk(s|ing)?|speak(s|ing)?|speech|um+|uh+|filler|sentence|intro|outro|transcript|scene(s)?)\b",
+    re.IGNORECASE,
+)
+
+def choose_context_mode(user_text: str) -> str:
+    """
+    Picks "index" when the command can be answered from text (speech, silences, scene cuts)
+    and "video" when it mentions anything visual or gives no clear hint.
+    """
+    if VISUAL_HINTS.search(user_text):
+        return "video"
+    if TEXT_HINTS.search(user_text):
+        return "index"
+    return "video"
+
+INDEX_PROMPT = """
+### CONTEXT MODE: MEDIA INDEX
+No video is attached. Instead you get a MEDIA INDEX of the file: its duration, silence intervals,
+scene-change times, and a word-level transcript ("start-end word", seconds).
+Treat these timestamps as ground truth and derive `segments_to_keep` from them only.
+
+"""
+
+# --- PLAN CACHE ---
+# Bumps automatically whenever the prompts change, so stale plans are never served
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + INDEX_PROMPT).encode("utf-8")).hexdigest()[:12]
+PLAN_CACHE_TTL = float(os.getenv("VOXEDIT_PLAN_CACHE_TTL", str(7 * 24 * 3600)))
+PLAN_CACHE_SIZE = int(os.getenv("VOXEDIT_PLAN_CACHE_SIZE", "2000"))
+
+plan_cache = DiskCache("plans", max_entries=PLAN_CACHE_SIZE, ttl=PLAN_CACHE_TTL)
+
+def normalize_command(text: str) -> str:
+    # "Remove  Silence!" and "remove silence" are the same request
+    return re.sub(r"\s+", " ", text.lower()).strip(" .!?")
+
+def plan_cache_key(digest: str, user_text: str, mode: str) -> str:
+    raw = json.dumps([digest, normalize_command(user_text), mode, PRIMARY_MODEL, FALLBACK_MODEL, PROMPT_VERSION])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def plan_cache_stats() -> dict:
+    return plan_cache.stats()
+
 # =========================
 # HELPER: VALIDATE SEGMENTS
 # =========================
+SEGMENT_FILTERS = {"grayscale", "sepia", "warm"}
+
+def sanitize_actions(actions):
+    """
+    Per-segment actions reduced to what the engine applies: known tools, speed clamped to 0.25-4x.
+    """
+    try:
+        chain = normalize_chain(actions if isinstance(actions, list) else [])
+    except (TypeError, ValueError, AttributeError):
+        return []
+    clean = []
+    for action in chain:
+        if action["tool"] == "speed" and action["params"]["factor"] > 0:
+            clean.append({"tool": "speed", "params": {"factor": min(4.0, max(0.25, action["params"]["factor"]))}})
+        elif action["tool"] == "filter" and action["params"]["type"] in SEGMENT_FILTERS:
+            clean.append(action)
+    return clean
+
 def sanitize_plan(plan):
     """
     Cleans up the AI's output to prevent FFmpeg crashes.
@@ -79,6 +172,12 @@ def sanitize_plan(plan):
             # Rule 2: Start must be positive
             if seg.get("start", 0) < 0:
                 seg["start"] = 0.0
+
+            # Rule 3: Per-segment effects the engine can't apply are dropped
+            if "actions" in seg:
+                seg["actions"] = sanitize_actions(seg["actions"])
+                if not seg["actions"]:
+                    del seg["actions"]
             
             valid_segments.append(seg)
     
@@ -88,48 +187,98 @@ def sanitize_plan(plan):
 # =========================
 # HELPER: UPLOAD VIDEO
 # =========================
-def upload_video_to_gemini(filename):
+# Uploads are cached by content hash, so repeat commands on a clip skip the upload
+upload_cache = GeminiFileCache(genai)
+
+# Upload a small analysis proxy instead of the original (set to 0 to send originals)
+USE_ANALYSIS_PROXY = os.getenv("VOXEDIT_ANALYSIS_PROXY", "1") == "1"
+
+async def _upload_for_analysis(file_path):
+    await asyncio.to_thread(get_gemini) # configures the API key before the first upload
+    if USE_ANALYSIS_PROXY:
+        proxy = await get_analysis_proxy(file_path)
+        if proxy:
+            return await upload_cache.get(proxy["path"], key=proxy["key"])
+    return await upload_cache.get(file_path)
+
+async def upload_video_to_gemini(filename):
     file_path = os.path.join(TEMP_DIR, filename)
     
     if not os.path.exists(file_path):
         print(f"❌ [AI AGENT] File not found locally: {file_path}")
         return None
 
-    print(f"--- 📤 [AI AGENT] Uploading {filename} to Gemini... ---")
-    
-    # 1. Upload
     try:
-        video_file = genai.upload_file(path=file_path)
+        # Joins the background upload started at /upload time, if it's still running
+        task = upload_cache.start(file_path, lambda: _upload_for_analysis(file_path))
+        return await asyncio.shield(task)
+    except (TimeoutError, ValueError):
+        raise
     except Exception as e:
         print(f"❌ [AI AGENT] Upload failed: {e}")
         return None
-    
-    # 2. Poll state
-    print(f"--- ⏳ [AI AGENT] Processing Video (URI: {video_file.uri})... ---")
-    
-    # Timeout safety (max 60 seconds wait)
-    start_time = time.time()
-    while video_file.state.name == "PROCESSING":
-        if time.time() - start_time > 60:
-            raise TimeoutError("Gemini video processing timed out.")
-        time.sleep(2)
-        video_file = genai.get_file(video_file.name)
-        
-    if video_file.state.name == "FAILED":
-        raise ValueError(f"Gemini failed to process video: {video_file.state.name}")
-        
-    print(f"--- ✅ [AI AGENT] Video Ready. ---")
-    return video_file
+
+def prefetch_video(filename):
+    """
+    Kicks off the Gemini upload + processing poll in the background (called from /upload),
+    so the user's first command doesn't pay for it.
+    """
+    file_path = os.path.join(TEMP_DIR, filename)
+    if os.path.exists(file_path):
+        return upload_cache.start(file_path, lambda: _upload_for_analysis(file_path))
+    return None
 
 # =========================
 # CORE AI FUNCTION
 # =========================
-async def analyze_command(user_text: str, video_filename: str = None):
-    # 1. Prepare Video
+async def analyze_command(user_text: str, video_filename: str = None, context_mode: str = None):
+    """
+    `context_mode`: "video" (upload the clip), "index" (send the text index only)
+    or "auto" (pick per command). Defaults to VOXEDIT_CONTEXT_MODE.
+    """
+    # 0. Plain "remove silence" needs no model: detect it locally from the audio
+    if video_filename and USE_LOCAL_SILENCE and is_silence_command(user_text):
+        file_path = os.path.join(TEMP_DIR, video_filename)
+        if os.path.exists(file_path):
+            try:
+                print("--- 🔇 [AI AGENT] Local silence engine (no model call) ---")
+                return sanitize_plan(await remove_silence_plan(file_path))
+            except Exception as e:
+                print(f"⚠️ [AI AGENT] Local silence engine failed ({e}). Asking the model...")
+
+    mode = context_mode or CONTEXT_MODE
+    if mode == "auto":
+        mode = choose_context_mode(user_text)
+
+    # 0b. Same clip + same command + same model/prompt -> reuse the earlier plan
+    cache_key = None
+    started = time.time()
+    if video_filename and os.path.exists(os.path.join(TEMP_DIR, video_filename)):
+        digest = await asyncio.to_thread(file_digest, os.path.join(TEMP_DIR, video_filename))
+        cache_key = plan_cache_key(digest, user_text, mode)
+        # SQLite calls can wait on another worker's write lock; keep them off the event loop
+        cached = await asyncio.to_thread(plan_cache.get, cache_key)
+        if cached:
+            print(f"--- ⚡ [AI AGENT] Plan cache hit (saved ~{cached['latency']:.1f}s) ---")
+            await asyncio.to_thread(plan_cache.incr, "saved_seconds", cached["latency"])
+            return cached["plan"]
+
+    # 1a. Text-answerable command: send the compact index instead of the video
+    media_index = None
+    if video_filename and mode == "index":
+        file_path = os.path.join(TEMP_DIR, video_filename)
+        if os.path.exists(file_path):
+            media_index = await get_media_index(file_path)
+        if media_index:
+            print(f"--- 📇 [AI AGENT] Using text index context ({len(media_index['words'])} words) ---")
+        else:
+            print("--- ⚠️ [AI AGENT] Index unavailable. Falling back to video upload. ---")
+
+    # 1b. Prepare Video
     video_file = None
-    if video_filename:
+    if video_filename and not media_index:
         try:
-            video_file = upload_video_to_gemini(video_filename)
+            video_file = await upload_video_to_gemini(video_filename)
             if not video_file:
                  return {"explanation": "Error: Video upload failed.", "segments_to_keep": []}
         except Exception as e:
@@ -137,10 +286,18 @@ async def analyze_command(user_text: str, video_filename: str = None):
 
     # 2. Construct Request
     prompt_parts = [SYSTEM_PROMPT, f"\nUSER COMMAND: {user_text}"]
+    if media_index:
+        prompt_parts.append(INDEX_PROMPT + format_index_for_prompt(media_index))
     if video_file:
         prompt_parts.append(video_file)
 
     # 3. Call Model (With Fallback Logic)
+    try:
+        await asyncio.to_thread(get_gemini)
+    except Exception as e:
+        return {"explanation": f"AI Error: {str(e)}", "segments_to_keep": []}
+    from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
     for model_name in [PRIMARY_MODEL, FALLBACK_MODEL]:
         try:
             print(f"--- 🧠 [AI AGENT] Reasoning with {model_name}... ---")
@@ -156,14 +313,16 @@ async def analyze_command(user_text: str, video_filename: str = None):
             # 4. Parsing & Cleanup
             try:
                 plan = json.loads(response.text)
-                clean_plan = sanitize_plan(plan) # Validate timestamps
-                return clean_plan
             
             except json.JSONDecodeError:
                 # Handle accidental markdown wrapping
                 text = response.text.replace("```json", "").replace("```", "").strip()
                 plan = json.loads(text)
-                return sanitize_plan(plan)
+
+            clean_plan = sanitize_plan(plan) # Validate timestamps
+            if cache_key:
+                await asyncio.to_thread(plan_cache.put, cache_key, {"plan": clean_plan, "latency": time.time() - started})
+            return clean_plan
 
         except (ResourceExhausted, ServiceUnavailable):
             print(f"⚠️ [AI AGENT] {model_name} overloaded. Switching to fallback...")
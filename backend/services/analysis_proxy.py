@@ -0,0 +1,95 @@
+# backend/services/analysis_proxy.py
+import os
+import asyncio
+
+import ffmpeg
+from services.content_hash import file_digest
+from services.inflight import InFlight
+from services.render_pool import run_ffmpeg, probe as probe_uncached
+from services.media_info import probe
+
+# --- CONFIG ---
+# The model only needs enough detail to find timestamps: small, sparse, mono.
+PROXY_HEIGHT = 360
+PROXY_FPS = 2            # Gemini samples video at ~1 fps anyway
+PROXY_VIDEO_BITRATE = "150k"
+PROXY_AUDIO_RATE = 16000
+PROXY_AUDIO_BITRATE = "32k"
+# Bump when the settings above change so old proxies aren't reused
+PROXY_VERSION = "v1"
+
+# Proxy must cover the same timeline; allow one proxy frame of slack
+DURATION_TOLERANCE = 1.0 / PROXY_FPS + 0.1
+
+_building = InFlight()
+
+def proxy_path_for(source_path: str, digest: str) -> str:
+    # Cached next to the original, in a hidden folder
+    return os.path.join(os.path.dirname(source_path), ".proxies", f"{digest}_{PROXY_VERSION}.mp4")
+
+# ==========================================
+# 🪶 ANALYSIS PROXY
+# ==========================================
+async def get_analysis_proxy(source_path: str):
+    """
+    Returns {"path", "key"} of a low-bitrate analysis copy of `source_path`, building it once.
+    Same timeline as the source (no trimming, timestamps preserved), so anything the
+    model finds in the proxy maps back 1:1. Returns None if a proxy can't be made.
+    """
+    digest = await asyncio.to_thread(file_digest, source_path)
+    path = proxy_path_for(source_path, digest)
+    result = {"path": path, "key": f"{digest}:proxy-{PROXY_VERSION}"}
+
+    if os.path.exists(path):
+        return result
+
+    try:
+        ok = await _building.run(path, lambda: _build_proxy(source_path, path))
+    except Exception as e:
+        print(f"⚠️ Analysis proxy failed ({e}). Using original file.")
+        return None
+    return result if ok else None
+
+async def _build_proxy(source_path: str, path: str) -> bool:
+    info = await probe(source_path)
+    video_info = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
+    has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+    if not video_info:
+        return False
+    # Never upscale; keep dimensions even for x264
+    height = min(PROXY_HEIGHT, int(video_info.get('height') or PROXY_HEIGHT)) // 2 * 2
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".part.mp4"
+    print(f"--- 🪶 Building analysis proxy for {os.path.basename(source_path)} ---")
+
+    inp = ffmpeg.input(source_path)
+    video = (
+        inp.video
+        .filter('scale', w=-2, h=height)
+        .filter('fps', fps=PROXY_FPS)
+    )
+    streams = [video]
+    opts = {
+        'vcodec': 'libx264', 'preset': 'veryfast', 'video_bitrate': PROXY_VIDEO_BITRATE,
+        'maxrate': PROXY_VIDEO_BITRATE, 'bufsize': '300k', 'pix_fmt': 'yuv420p',
+    }
+    if has_audio:
+        streams.append(inp.audio)
+        opts.update({'acodec': 'aac', 'ac': 1, 'ar': PROXY_AUDIO_RATE, 'audio_bitrate': PROXY_AUDIO_BITRATE})
+
+    await run_ffmpeg(ffmpeg.output(*streams, tmp_path, movflags='faststart', **opts))
+
+    # Timestamps only map back if the proxy covers the same span as the source
+    src_dur = float(info['format'].get('duration', 0) or 0)
+    # The temp file is renamed right after, so caching its probe would only waste an entry
+    proxy_dur = float((await probe_uncached(tmp_path))['format'].get('duration', 0) or 0)
+    if abs(src_dur - proxy_dur) > DURATION_TOLERANCE:
+        print(f"⚠️ Proxy duration {proxy_dur:.2f}s != source {src_dur:.2f}s. Discarding proxy.")
+        os.remove(tmp_path)
+        return False
+
+    os.replace(tmp_path, path)
+    src_size, proxy_size = os.path.getsize(source_path), os.path.getsize(path)
+    print(f"--- ✅ Proxy ready: {src_size / 1e6:.1f} MB -> {proxy_size / 1e6:.1f} MB ---")
+    return True
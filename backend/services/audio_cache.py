@@ -0,0 +1,102 @@
+# backend/services/audio_cache.py
+import os
+import asyncio
+
+import numpy as np
+from services.content_hash import file_digest
+from services.inflight import InFlight
+from services.render_pool import render_pool
+from services.media_info import probe
+
+# --- CONFIG ---
+# One format for every consumer: what Whisper wants, and plenty for VAD / waveforms / loudness
+SAMPLE_RATE = 16000
+DTYPE = np.float32
+
+_extracting = InFlight()
+
+def pcm_path_for(source_path: str, digest: str) -> str:
+    return os.path.join(os.path.dirname(source_path), ".audio", f"{digest}_{SAMPLE_RATE}.f32")
+
+# ==========================================
+# 🎧 DECODED AUDIO CACHE (raw f32le on disk, memory-mapped)
+# ==========================================
+async def get_pcm(source_path: str) -> np.ndarray:
+    """
+    Returns the source's audio as 16 kHz mono float32, decoded by FFmpeg once per content hash
+    and opened with numpy.memmap, so every reader shares the same pages without copies.
+    Files without an audio stream give an empty array; any other decode failure raises.
+    """
+    digest = await asyncio.to_thread(file_digest, source_path)
+    path = pcm_path_for(source_path, digest)
+
+    # An empty artifact written by an older build for a file that does have audio is re-extracted
+    if not os.path.exists(path) or (os.path.getsize(path) == 0 and await _has_audio(source_path)):
+        await _extracting.run(path, lambda: _extract(source_path, path))
+    return open_pcm(path)
+
+async def _has_audio(source_path: str) -> bool:
+    info = await probe(source_path)
+    return any(s['codec_type'] == 'audio' for s in info['streams'])
+
+def open_pcm(path: str) -> np.ndarray:
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=DTYPE) # memmap can't map an empty file
+    return np.memmap(path, dtype=DTYPE, mode='r')
+
+async def _extract(source_path: str, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    args = [
+        'ffmpeg', '-hide_banner', '-nostats', '-v', 'error', '-y', '-i', source_path,
+        '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', tmp_path
+    ]
+    if not await _has_audio(source_path):
+        # No audio stream: cache an empty artifact so we don't retry on every call
+        open(tmp_path, 'wb').close()
+        os.replace(tmp_path, path)
+        return
+    try:
+        await render_pool.run(args)
+        os.replace(tmp_path, path)
+    finally:
+        # Missing ffmpeg, a full disk, a truncated file: nothing is cached, the next call retries
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# =========================
+# ANALYSIS (reads the shared PCM)
+# =========================
+def waveform_peaks(samples: np.ndarray, points: int = 1000) -> dict:
+    """
+    Min/max envelope with `points` buckets for drawing a waveform.
+    """
+    points = max(1, min(points, len(samples)))
+    if len(samples) == 0:
+        return {"min": [], "max": [], "seconds_per_point": 0.0}
+    bucket = len(samples) // points
+    view = samples[:bucket * points].reshape(points, bucket)
+    return {
+        "min": np.round(view.min(axis=1), 4).tolist(),
+        "max": np.round(view.max(axis=1), 4).tolist(),
+        "seconds_per_point": bucket / SAMPLE_RATE,
+    }
+
+def loudness(samples: np.ndarray) -> dict:
+    """
+    Overall RMS and peak level in dBFS (not K-weighted; good enough for gain decisions).
+    """
+    if len(samples) == 0:
+        return {"rms_db": None, "peak_db": None, "duration": 0.0}
+    # Chunked so a long memmap isn't pulled into one giant temporary
+    total, peak = 0.0, 0.0
+    for i in range(0, len(samples), SAMPLE_RATE * 60):
+        block = np.asarray(samples[i:i + SAMPLE_RATE * 60], dtype=np.float64)
+        total += float(np.dot(block, block))
+        peak = max(peak, float(np.abs(block).max()))
+    rms = (total / len(samples)) ** 0.5
+    return {
+        "rms_db": round(20 * np.log10(rms + 1e-10), 2),
+        "peak_db": round(20 * np.log10(peak + 1e-10), 2),
+        "duration": len(samples) / SAMPLE_RATE,
+    }
@@ -0,0 +1,51 @@
+# backend/services/audio_track.py
+import ffmpeg
+from services.render_pool import run_ffmpeg
+
+# --- CONFIG ---
+# Pieces / chunks are video-only; the audio of a render is encoded once with these settings.
+AUDIO_OPTS = {'acodec': 'aac', 'ar': 48000, 'ac': 2, 'audio_bitrate': '128k'}
+
+# ==========================================
+# 🔊 CONTINUOUS AUDIO TRACK
+# ==========================================
+# Every AAC encode adds priming samples and pads its last frame, so joining separately
+# encoded audio pieces leaves a click / gap at each join. Renders that split the video
+# into pieces encode the whole audio track in one pass instead and mux it with `-c copy`.
+def atempo(audio, factor: float):
+    """
+    Speed change for an audio stream (atempo only takes 0.5-2.0 per filter, so chain them).
+    """
+    while factor > 2.0:
+        audio = audio.filter('atempo', 2.0); factor /= 2.0
+    while factor < 0.5:
+        audio = audio.filter('atempo', 0.5); factor /= 0.5
+    if factor != 1.0:
+        audio = audio.filter('atempo', factor)
+    return audio
+
+def audio_track(input_path: str, spans: list):
+    """
+    One audio stream for `spans` ([(start, end, speed), ...] in source seconds, output order):
+    each span is input-seeked, sped up if needed and concatenated.
+    """
+    parts = []
+    for start, end, speed in spans:
+        a = ffmpeg.input(input_path, ss=start, t=end - start).audio.filter('asetpts', 'PTS-STARTPTS')
+        parts.append(atempo(a, speed))
+    return parts[0] if len(parts) == 1 else ffmpeg.concat(*parts, v=0, a=1)
+
+async def render_audio(input_path: str, spans: list, audio_path: str):
+    """
+    Encodes `audio_track(input_path, spans)` to `audio_path` (AAC in MP4/M4A). Raises ffmpeg.Error.
+    """
+    await run_ffmpeg(ffmpeg.output(audio_track(input_path, spans), audio_path, f='mp4', **AUDIO_OPTS))
+
+async def join_pieces(list_path: str, output_path: str, audio_path: str = None):
+    """
+    Joins the video pieces listed in `list_path` (concat demuxer) and, when given, muxes
+    the continuous audio track next to them. Nothing is re-encoded.
+    """
+    video = ffmpeg.input(list_path, format='concat', safe=0).video
+    streams = [video, ffmpeg.input(audio_path).audio] if audio_path else [video]
+    await run_ffmpeg(ffmpeg.output(*streams, output_path, c='copy', movflags='faststart'))
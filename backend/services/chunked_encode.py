@@ -0,0 +1,191 @@
+# backend/services/chunked_encode.py
+import os
+import sys
+import time
+import uuid
+import shutil
+import asyncio
+import bisect
+
+import ffmpeg
+from services.render_pool import run_ffmpeg
+from services.audio_track import join_pieces
+
+TEMP_DIR = "temp_storage"
+
+# --- CONFIG ---
+# Cores we may spend on one render, and how many x264 threads each chunk gets.
+CPU_BUDGET = int(os.getenv("VOXEDIT_CPU_BUDGET", str(os.cpu_count() or 2)))
+THREADS_PER_CHUNK = int(os.getenv("VOXEDIT_CHUNK_THREADS", "2"))
+CHUNK_WORKERS = max(1, CPU_BUDGET // THREADS_PER_CHUNK)
+
+# Renders shorter than this stay single-process (spawn + join overhead isn't worth it)
+CHUNK_MIN_SECONDS = float(os.getenv("VOXEDIT_CHUNK_MIN_SECONDS", "120"))
+# Never cut chunks shorter than this
+MIN_CHUNK_LENGTH = 20.0
+
+def should_chunk(duration: float, video_codec: str, workers: int = CHUNK_WORKERS) -> bool:
+    """
+    Chunking only helps software x264; hardware encoders are already parallel.
+    """
+    return video_codec == 'libx264' and workers > 1 and duration >= CHUNK_MIN_SECONDS
+
+def _nearest_keyframe(keyframes: list, target: float, low: float, high: float):
+    # Closest keyframe strictly inside (low, high), or None
+    i = bisect.bisect_left(keyframes, target)
+    candidates = [k for k in keyframes[max(0, i - 1):i + 1] if low < k < high]
+    return min(candidates, key=lambda k: abs(k - target)) if candidates else None
+
+# ==========================================
+# 🧩 CHUNK PLANNERS
+# ==========================================
+def split_range(start: float, end: float, keyframes: list, workers: int = CHUNK_WORKERS) -> list:
+    """
+    Splits [start, end) into up to `workers` chunks with boundaries snapped to keyframes.
+    Returns [(chunk_start, chunk_end), ...] in source time.
+    """
+    count = max(1, min(workers, int((end - start) // MIN_CHUNK_LENGTH)))
+    step = (end - start) / count
+
+    bounds = [start]
+    for i in range(1, count):
+        k = _nearest_keyframe(keyframes, start + i * step, bounds[-1] + MIN_CHUNK_LENGTH / 2, end)
+        if k is not None:
+            bounds.append(k)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def split_segments(segments: list, keyframes: list, workers: int = CHUNK_WORKERS) -> list:
+    """
+    Groups kept segments into up to `workers` chunks of similar output length.
+    Segments longer than a chunk are split at a keyframe (both halves keep the segment's other
+    keys, e.g. its 'actions'). Returns a list of segment lists.
+    """
+    total = sum(float(seg['end']) - float(seg['start']) for seg in segments)
+    target = max(MIN_CHUNK_LENGTH, total / max(1, workers))
+
+    groups, current, acc = [], [], 0.0
+    for seg in segments:
+        start, end = float(seg['start']), float(seg['end'])
+
+        # Split long segments so the current chunk lands near the target length
+        while acc + (end - start) > target:
+            k = _nearest_keyframe(keyframes, start + (target - acc), start, end)
+            if k is None:
+                break
+            current.append({**seg, "start": start, "end": k})
+            groups.append(current)
+            current, acc = [], 0.0
+            start = k
+
+        current.append({**seg, "start": start, "end": end})
+        acc += end - start
+        if acc >= target:
+            groups.append(current)
+            current, acc = [], 0.0
+
+    if current:
+        groups.append(current)
+    return groups
+
+# ==========================================
+# 🏎️ PARALLEL CHUNK ENCODER
+# ==========================================
+async def encode_chunks(output_path: str, builders: list, durations: list, on_progress=None, audio=None) -> bool:
+    """
+    Encodes every chunk in parallel, then joins them losslessly with the concat demuxer.
+    `builders[i](chunk_path, threads)` must return an ffmpeg output node writing video-only MPEG-TS.
+    `audio(audio_path)` (async, optional) writes the whole audio track in one pass, alongside the
+    chunks; it is muxed in at the join so chunk boundaries leave no AAC seams.
+    Raises ffmpeg.Error if any chunk fails.
+    """
+    work_dir = os.path.join(TEMP_DIR, f"chunks_{uuid.uuid4()}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    total = sum(durations)
+    chunk_done = [0.0] * len(builders)
+    # Fewer chunks than workers -> give each one more threads
+    threads = max(1, CPU_BUDGET // len(builders))
+
+    async def encode(idx, build):
+        chunk_path = os.path.join(work_dir, f"chunk_{idx:04d}.ts")
+
+        async def report(stats):
+            if stats.get("out_time") is not None:
+                chunk_done[idx] = min(stats["out_time"], durations[idx])
+            if on_progress:
+                out_time = sum(chunk_done)
+                await on_progress({
+                    "out_time": out_time, "percent": min(99.9, out_time / total * 100) if total else None,
+                    "fps": None, "speed": None, "eta": None, "done": False
+                })
+
+        await run_ffmpeg(build(chunk_path, threads), on_progress=report, duration=durations[idx])
+        return chunk_path
+
+    try:
+        print(f"--- 🏎️ Encoding {len(builders)} chunks in parallel ({threads} threads each) ---")
+        audio_path = os.path.join(work_dir, "audio.m4a") if audio else None
+        jobs = [encode(i, b) for i, b in enumerate(builders)] + ([audio(audio_path)] if audio else [])
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        list_path = os.path.join(work_dir, "chunks.txt")
+        with open(list_path, 'w') as f:
+            for path in results[:len(builders)]:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        await join_pieces(list_path, output_path, audio_path)
+        if on_progress:
+            await on_progress({"out_time": total, "percent": 100.0, "fps": None, "speed": None, "eta": 0.0, "done": True})
+        return True
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# =========================
+# LOCAL BENCHMARK
+# =========================
+if __name__ == "__main__":
+    # Usage (from backend/): python -m services.chunked_encode [duration_seconds]
+    from services.media_info import get_keyframes
+    from services.audio_track import render_audio
+
+    async def bench():
+        duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3600.0
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        src = os.path.join(TEMP_DIR, f"bench_src_{int(duration)}s.mp4")
+
+        if not os.path.exists(src):
+            print(f"🧪 Generating synthetic {duration:.0f}s input...")
+            video = ffmpeg.input("testsrc2=size=1280x720:rate=30", f='lavfi', t=duration)
+            audio = ffmpeg.input("sine=frequency=440:sample_rate=44100", f='lavfi', t=duration)
+            await run_ffmpeg(ffmpeg.output(video, audio, src, vcodec='libx264', preset='ultrafast', g=60, acodec='aac'))
+
+        keyframes = await get_keyframes(src)
+        baseline = None
+        print(f"\n{'chunks':>6} | {'wall (s)':>9} | {'speedup':>7}")
+        for workers in sorted({1, 2, 4, 8, CHUNK_WORKERS}):
+            out = os.path.join(TEMP_DIR, f"bench_out_{workers}.mp4")
+            ranges = split_range(0.0, duration, keyframes, workers)
+
+            def builder(a, b):
+                def build(chunk_path, threads):
+                    inp = ffmpeg.input(src, ss=a, t=b - a)
+                    return ffmpeg.output(
+                        inp.video.filter('hue', s=0), chunk_path,
+                        vcodec='libx264', preset='ultrafast', threads=threads, f='mpegts'
+                    )
+                return build
+
+            t0 = time.perf_counter()
+            await encode_chunks(out, [builder(a, b) for a, b in ranges], [b - a for a, b in ranges],
+                                audio=lambda path: render_audio(src, [(0.0, duration, 1.0)], path))
+            wall = time.perf_counter() - t0
+            baseline = baseline or wall
+            print(f"{len(ranges):>6} | {wall:>9.1f} | {baseline / wall:>6.2f}x")
+            os.remove(out)
+
+    asyncio.run(bench())
@@ -0,0 +1,47 @@
+# backend/services/content_hash.py
+import os
+import re
+import hashlib
+
+# Read big media files in large blocks; hashing is I/O bound
+HASH_CHUNK = 8 * 1024 * 1024
+
+# (abs path, mtime_ns, size) -> sha256 hex, so unchanged files are hashed once per process
+_DIGESTS = {}
+
+# Uploads are stored as "<sha256>.<ext>" (see upload_store): the name already is the digest
+ADDRESSED_NAME = re.compile(r"^([0-9a-f]{64})\.[a-z0-9]{1,8}$")
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's content. This is the key every per-file cache uses.
+    Blocking (reads the whole file on a miss) -> call via asyncio.to_thread from async code.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if key in _DIGESTS:
+        return _DIGESTS[key]
+
+    addressed = ADDRESSED_NAME.match(os.path.basename(path))
+    if addressed:
+        _DIGESTS[key] = addressed.group(1)
+        return _DIGESTS[key]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_CHUNK)
+            if not block:
+                break
+            h.update(block)
+
+    digest = h.hexdigest()
+    _DIGESTS[key] = digest
+    return digest
+
+def register_digest(path: str, digest: str):
+    """
+    Records a digest computed elsewhere (e.g. while the file was streamed in), so nobody re-reads it.
+    """
+    st = os.stat(path)
+    _DIGESTS[(os.path.abspath(path), st.st_mtime_ns, st.st_size)] = digest
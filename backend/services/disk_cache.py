@@ -0,0 +1,132 @@
+# backend/services/disk_cache.py
+import os
+import json
+import time
+import sqlite3
+
+# Kept outside temp_storage: /files serves that directory publicly
+CACHE_DIR = os.getenv("VOXEDIT_CACHE_DIR", "cache_storage")
+
+# ==========================================
+# 🗄️ DISK CACHE (SQLite, LRU + TTL)
+# ==========================================
+class DiskCache:
+    """
+    Small persistent key -> JSON cache shared by every worker process on the host.
+    Entries expire after `ttl` seconds; beyond `max_entries` (or `max_bytes` of managed
+    files) the least recently used go first.
+    An entry may own a file (`put(..., path=...)`): its size counts towards `max_bytes`,
+    it is deleted on eviction, and the entry is a miss once the file is gone.
+    Hit/miss counters (and any custom ones via `incr`) live in the same database.
+    """
+    def __init__(self, name: str, max_entries: int = None, ttl: float = None,
+                 directory: str = CACHE_DIR, max_bytes: int = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.sqlite3")
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+            if "path" not in columns: # databases created before file-backed entries
+                conn.execute("ALTER TABLE entries ADD COLUMN path TEXT")
+                conn.execute("ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _connect(self):
+        # WAL lets readers and a writer from other uvicorn workers proceed together
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created_at, path FROM entries WHERE key = ?", (key,)).fetchone()
+            expired = row and self.ttl and now - row[1] > self.ttl
+            if expired or (row and row[2] and not os.path.exists(row[2])):
+                self._drop(conn, [(key, row[2])])
+                row = None
+
+            if row is None:
+                self._incr(conn, "misses")
+                return None
+
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._incr(conn, "hits")
+            return json.loads(row[0])
+
+    def put(self, key: str, value: dict, path: str = None):
+        """
+        Stores `value`; with `path`, the entry also owns that (already written) file.
+        """
+        now = time.time()
+        size = os.path.getsize(path) if path else 0
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at, path, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, now, path, size),
+            )
+            self._evict(conn)
+
+    def incr(self, counter: str, amount: float = 1):
+        with self._connect() as conn:
+            self._incr(conn, counter, amount)
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            **counters,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def _incr(self, conn, counter: str, amount: float = 1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (counter, amount),
+        )
+
+    def _evict(self, conn):
+        if self.ttl:
+            self._drop(conn, conn.execute(
+                "SELECT key, path FROM entries WHERE created_at < ?", (time.time() - self.ttl,)).fetchall())
+        if self.max_entries:
+            self._drop(conn, conn.execute(
+                "SELECT key, path FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                (self.max_entries,)).fetchall())
+        if self.max_bytes:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            victims = []
+            for key, path, size in conn.execute("SELECT key, path, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key, path))
+                total -= size
+            self._drop(conn, victims)
+
+    def _drop(self, conn, rows):
+        # rows: [(key, path)]; managed files go with their entries
+        for key, path in rows:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
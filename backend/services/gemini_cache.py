@@ -0,0 +1,127 @@
+# backend/services/gemini_cache.py
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+
+from services.content_hash import file_digest
+from services.inflight import InFlight
+from services.disk_cache import CACHE_DIR
+
+# --- CONFIG ---
+# Gemini keeps uploaded files for 48h. Re-upload once an entry is this close to expiring.
+DEFAULT_TTL = 47 * 3600
+REFRESH_MARGIN = 2 * 3600
+PROCESSING_TIMEOUT = 60
+POLL_INTERVAL = 2
+
+# ==========================================
+# 🗂️ GEMINI FILE CACHE (content hash -> uploaded file)
+# ==========================================
+class GeminiFileCache:
+    """
+    Maps the content hash of a local file to its uploaded Gemini file, so the same
+    clip is uploaded once no matter how many commands run against it.
+
+    `client` is anything with `upload_file(path=...)` and `get_file(name)`
+    (the `google.generativeai` module, or a stand-in in tests).
+    """
+    def __init__(self, client, index_path: str = os.path.join(CACHE_DIR, "gemini_files.json")):
+        self.client = client
+        self.index_path = index_path
+        self.entries = self._load()
+        self.inflight = InFlight()
+        # abs path -> running upload task for that file (started at /upload time or on demand)
+        self.tasks: dict = {}
+
+    # --- persistence ---
+    def _load(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    # --- lookup ---
+    async def get(self, file_path: str, key: str = None):
+        """
+        Returns an ACTIVE Gemini file for `file_path`, uploading only on a miss or near expiry.
+        `key` overrides the content hash (e.g. to cache a derived variant of the file).
+        """
+        key = key or await asyncio.to_thread(file_digest, file_path)
+
+        entry = self.entries.get(key)
+        if entry and entry["expires_at"] - time.time() > REFRESH_MARGIN:
+            try:
+                handle = await asyncio.to_thread(self.client.get_file, entry["name"])
+                if handle.state.name == "ACTIVE":
+                    print(f"--- ⚡ [AI AGENT] Reusing uploaded file {entry['name']} ---")
+                    return handle
+            except Exception as e:
+                print(f"⚠️ [AI AGENT] Cached upload {entry['name']} unusable ({e}). Re-uploading...")
+            self.entries.pop(key, None)
+
+        # Concurrent requests for the same content wait on one upload
+        return await self.inflight.run(key, lambda: self._upload(key, file_path))
+
+    def start(self, file_path: str, factory=None) -> asyncio.Task:
+        """
+        Starts (or joins) the background upload for `file_path` and returns its task.
+        `factory` is the coroutine function doing the work (defaults to `get(file_path)`),
+        so callers can add preparation steps. A second call while it runs gets the same task.
+        """
+        path = os.path.abspath(file_path)
+        task = self.tasks.get(path)
+        if task and not task.done():
+            return task
+
+        task = asyncio.create_task(factory() if factory else self.get(file_path))
+        self.tasks[path] = task
+
+        def _done(t):
+            if self.tasks.get(path) is t:
+                del self.tasks[path]
+            if not t.cancelled() and t.exception():
+                print(f"⚠️ [AI AGENT] Background upload of {os.path.basename(path)} failed: {t.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _upload(self, key: str, file_path: str):
+        print(f"--- 📤 [AI AGENT] Uploading {os.path.basename(file_path)} to Gemini... ---")
+        handle = await asyncio.to_thread(self.client.upload_file, path=file_path)
+
+        print(f"--- ⏳ [AI AGENT] Processing Video (URI: {handle.uri})... ---")
+        start_time = time.time()
+        while handle.state.name == "PROCESSING":
+            if time.time() - start_time > PROCESSING_TIMEOUT:
+                raise TimeoutError("Gemini video processing timed out.")
+            await asyncio.sleep(POLL_INTERVAL)
+            handle = await asyncio.to_thread(self.client.get_file, handle.name)
+
+        if handle.state.name == "FAILED":
+            raise ValueError(f"Gemini failed to process video: {handle.state.name}")
+
+        self.entries[key] = {
+            "name": handle.name,
+            "uri": handle.uri,
+            "expires_at": _expiry(handle),
+        }
+        self._save()
+        print(f"--- ✅ [AI AGENT] Video Ready. ---")
+        return handle
+
+def _expiry(handle) -> float:
+    # Prefer the server's expiration_time; fall back to the documented 48h retention
+    expires = getattr(handle, "expiration_time", None)
+    if isinstance(expires, datetime):
+        return expires.timestamp()
+    return time.time() + DEFAULT_TTL
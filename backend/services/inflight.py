@@ -0,0 +1,29 @@
+# backend/services/inflight.py
+import asyncio
+
+class InFlight:
+    """
+    Request coalescing: concurrent callers asking for the same key share one task
+    instead of each starting their own expensive call.
+    """
+    def __init__(self):
+        self._tasks: dict = {}
+
+    def get(self, key):
+        """The running task for `key`, if any."""
+        return self._tasks.get(key)
+
+    def start(self, key, factory) -> asyncio.Task:
+        """
+        Returns the running task for `key`, or starts `factory()` (a coroutine function) as a new one.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+        return task
+
+    async def run(self, key, factory):
+        # shield: one caller going away must not cancel the work for everyone else
+        return await asyncio.shield(self.start(key, factory))
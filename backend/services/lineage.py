@@ -0,0 +1,49 @@
+# backend/services/lineage.py
+import asyncio
+
+from services.content_hash import file_digest
+from services.disk_cache import DiskCache
+
+# ==========================================
+# 🧬 CUT LINEAGE (derived file -> source + kept spans)
+# ==========================================
+# When an edit only removes time (no speed change, no re-timing), every moment of the
+# output maps back to one moment of the source. Recording that lets per-file results
+# such as transcripts be remapped instead of recomputed.
+lineage = DiskCache("lineage", max_entries=5000)
+
+async def record_cut(source_path: str, output_path: str, spans: list):
+    """
+    Remembers that `output_path` is `spans` ([[start, end], ...] in output order) of `source_path`.
+    """
+    source_digest, output_digest = await asyncio.gather(
+        asyncio.to_thread(file_digest, source_path),
+        asyncio.to_thread(file_digest, output_path),
+    )
+    if source_digest == output_digest:
+        return
+    spans = [[float(s), float(e)] for s, e in spans if e > s]
+    await asyncio.to_thread(lineage.put, output_digest, {"source": source_digest, "spans": spans})
+
+def get_cut(digest: str):
+    """
+    Returns {"source": digest, "spans": [[start, end], ...]} for a derived file, or None.
+    """
+    return lineage.get(digest)
+
+def remap_timed(items: list, spans: list, min_overlap: float = 0.5) -> list:
+    """
+    Maps source-timeline items ({start, end, ...}) onto the output of a cut.
+    Items are clipped to each kept span; ones that keep less than `min_overlap`
+    of their length are dropped (their text would mostly be missing).
+    """
+    out, offset = [], 0.0
+    for span_start, span_end in spans:
+        for item in items:
+            start, end = max(item["start"], span_start), min(item["end"], span_end)
+            length = item["end"] - item["start"]
+            if end <= start or (length > 0 and (end - start) / length < min_overlap):
+                continue
+            out.append({**item, "start": round(start - span_start + offset, 3), "end": round(end - span_start + offset, 3)})
+        offset += span_end - span_start
+    return out
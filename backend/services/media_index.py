@@ -0,0 +1,134 @@
+# backend/services/media_index.py
+import os
+import re
+import json
+import asyncio
+
+from services.content_hash import file_digest
+from services.inflight import InFlight
+from services.render_pool import render_pool
+from services.media_info import probe
+from services.silence_engine import find_silences
+from services.audio_cache import get_pcm
+from services.registry import get_whisper
+
+# --- CONFIG ---
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SECONDS = 0.5
+SCENE_THRESHOLD = 0.3
+# Bump when the index format changes so stale indexes are rebuilt
+INDEX_VERSION = "v2"
+
+_building = InFlight()
+
+def index_path_for(source_path: str, digest: str) -> str:
+    return os.path.join(os.path.dirname(source_path), ".index", f"{digest}_{INDEX_VERSION}.json")
+
+# ==========================================
+# 📇 MEDIA INDEX (words + silences + scenes)
+# ==========================================
+async def get_media_index(source_path: str):
+    """
+    Returns the compact text index of a file, building and caching it once per content hash:
+    {
+      "duration": 93.4,
+      "words":    [[start, end, "word"], ...],
+      "silences": [[start, end], ...],
+      "scenes":   [time, ...]
+    }
+    Returns None if the index can't be built.
+    """
+    digest = await asyncio.to_thread(file_digest, source_path)
+    path = index_path_for(source_path, digest)
+
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass # rebuild below
+
+    try:
+        return await _building.run(path, lambda: _build_index(source_path, path))
+    except Exception as e:
+        print(f"⚠️ Media index failed: {e}")
+        return None
+
+async def _build_index(source_path: str, path: str) -> dict:
+    print(f"--- 📇 Indexing {os.path.basename(source_path)} (words, silences, scenes) ---")
+    info = await probe(source_path)
+    has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+    has_video = any(s['codec_type'] == 'video' for s in info['streams'])
+
+    # Decode the audio once; transcription and silence detection both read the memmap
+    samples = await get_pcm(source_path) if has_audio else None
+    words, silences, scenes = await asyncio.gather(
+        asyncio.to_thread(transcribe_words, samples) if has_audio else _empty(),
+        _empty() if samples is None else asyncio.to_thread(
+            find_silences, samples, threshold_db=SILENCE_NOISE_DB, min_gap=SILENCE_MIN_SECONDS),
+        detect_scenes(source_path) if has_video else _empty(),
+    )
+    index = {
+        "duration": round(float(info['format'].get('duration', 0) or 0), 2),
+        "words": words,
+        "silences": silences,
+        "scenes": scenes,
+    }
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+    return index
+
+async def _empty():
+    return []
+
+# =========================
+# EXTRACTORS
+# =========================
+def transcribe_words(samples) -> list:
+    """
+    Word-level timestamps from the shared faster-whisper model (loaded on first use),
+    read from the shared 16 kHz PCM. Blocking -> run in a thread.
+    """
+    segments, _ = get_whisper().transcribe(samples, beam_size=1, word_timestamps=True)
+    words = []
+    for segment in segments:
+        for w in segment.words or []:
+            words.append([round(w.start, 2), round(w.end, 2), w.word.strip()])
+    return words
+
+async def detect_scenes(source_path: str) -> list:
+    # Reuse the low-fps analysis proxy when there is one: same timeline, far fewer frames
+    from services.analysis_proxy import proxy_path_for
+    digest = await asyncio.to_thread(file_digest, source_path)
+    proxy = proxy_path_for(source_path, digest)
+    target = proxy if os.path.exists(proxy) else source_path
+
+    args = [
+        'ffmpeg', '-hide_banner', '-nostats', '-i', target, '-an',
+        '-vf', f"select='gt(scene,{SCENE_THRESHOLD})',showinfo",
+        '-f', 'null', '-'
+    ]
+    _, stderr = await render_pool.run(args)
+    log = stderr.decode('utf-8', errors='ignore')
+    return [round(float(t), 2) for t in re.findall(r'pts_time:([\d.]+)', log)]
+
+# =========================
+# PROMPT FORMATTING
+# =========================
+def format_index_for_prompt(index: dict) -> str:
+    """
+    Compact, token-cheap text rendering of the index for the model.
+    """
+    lines = [f"DURATION: {index['duration']}s"]
+
+    silences = ", ".join(f"{s}-{e}" for s, e in index["silences"])
+    lines.append(f"SILENCES (start-end): {silences or 'none'}")
+    lines.append(f"SCENE CHANGES: {', '.join(str(t) for t in index['scenes']) or 'none'}")
+
+    lines.append("TRANSCRIPT (start-end word):")
+    lines.extend(f"{s}-{e} {w}" for s, e, w in index["words"])
+    return "\n".join(lines)
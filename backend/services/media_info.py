@@ -0,0 +1,152 @@
+# backend/services/media_info.py
+import os
+import asyncio
+import bisect
+from fractions import Fraction
+
+from services.render_pool import probe as run_probe, _exec
+from services.disk_cache import DiskCache
+from services.inflight import InFlight
+
+# ==========================================
+# 🗂️ MEDIA METADATA INDEX
+# ==========================================
+# ffprobe output, a summary and the keyframe list per file version (path + mtime + size),
+# persisted for every worker. Files never change in place here (uploads are content
+# addressed, renders get fresh names), so an entry stays valid as long as its file does.
+media_index = DiskCache("media_info", max_entries=20000)
+_probing = InFlight()
+_indexing = InFlight()
+_memo = {}          # per-process front of the SQLite index
+MEMO_LIMIT = 4096
+
+def _file_key(path: str) -> str:
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+
+async def _cached(key: str, build):
+    if key in _memo:
+        return _memo[key]
+    value = await asyncio.to_thread(media_index.get, key)
+    if value is None:
+        value = await _probing.run(key, build)
+    if len(_memo) >= MEMO_LIMIT:
+        _memo.clear()
+    _memo[key] = value
+    return value
+
+async def probe(path: str) -> dict:
+    """
+    Cached drop-in for `render_pool.probe` (ffprobe JSON: streams + format).
+    """
+    key = _file_key(path)
+
+    async def build():
+        info = await run_probe(path)
+        await asyncio.to_thread(media_index.put, key, info)
+        return info
+
+    return await _cached(key, build)
+
+async def get_gop_index(path: str) -> dict:
+    """
+    {"keyframes": [...], "frames_before": [...]} for the first video stream: keyframe times
+    (seconds from file start) and how many frames precede each one. Scanned once per file.
+    """
+    key = _file_key(path) + "|gops"
+
+    async def build():
+        info = await probe(path)
+        start_time = float(info['format'].get('start_time', 0) or 0)
+        gops = await scan_gops(path, start_time)
+        await asyncio.to_thread(media_index.put, key, gops)
+        return gops
+
+    return await _cached(key, build)
+
+async def get_keyframes(path: str) -> list:
+    """
+    Keyframe times of the first video stream (seconds from file start).
+    """
+    return (await get_gop_index(path))["keyframes"]
+
+async def scan_gops(input_path: str, start_time: float = 0.0) -> dict:
+    """
+    Reads packet timestamps and flags only (nothing gets decoded); see get_gop_index.
+    """
+    args = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path
+    ]
+    stdout, _ = await _exec(args)
+
+    times, keyframes = [], set()
+    for line in stdout.decode('utf-8', errors='ignore').splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or parts[0] in ('', 'N/A'):
+            continue
+        t = float(parts[0]) - start_time
+        times.append(t)
+        if 'K' in parts[1]:
+            keyframes.add(t)
+    times.sort()
+    keyframes = sorted(keyframes)
+    return {"keyframes": keyframes, "frames_before": [bisect.bisect_left(times, k) for k in keyframes]}
+
+def summarize(info: dict) -> dict:
+    """
+    The fields callers actually branch on, from an ffprobe result.
+    """
+    video = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
+    audio = next((s for s in info['streams'] if s['codec_type'] == 'audio'), None)
+    fmt = info.get('format', {})
+    fps = None
+    if video:
+        try:
+            fps = round(float(Fraction(video.get('avg_frame_rate') or '0')), 3) or None
+        except ZeroDivisionError:
+            pass
+    return {
+        "duration": float(fmt.get('duration', 0) or 0),
+        "start_time": float(fmt.get('start_time', 0) or 0),
+        "size": int(fmt.get('size', 0) or 0),
+        "container": fmt.get('format_name'),
+        "has_video": video is not None,
+        "has_audio": audio is not None,
+        "width": int(video['width']) if video else None,
+        "height": int(video['height']) if video else None,
+        "fps": fps,
+        "video_codec": video.get('codec_name') if video else None,
+        "audio_codec": audio.get('codec_name') if audio else None,
+        "streams": len(info['streams']),
+    }
+
+async def get_media_info(path: str, keyframes: bool = False) -> dict:
+    """
+    Summary (plus the keyframe list when asked) for a file, from the index.
+    """
+    info = summarize(await probe(path))
+    if keyframes and info["has_video"]:
+        info["keyframes"] = await get_keyframes(path)
+    return info
+
+async def index_media(path: str):
+    """
+    Fills the index for a new file (called at upload / render time). Never raises.
+    """
+    try:
+        if (await get_media_info(path))["has_video"]:
+            await get_keyframes(path)
+    except Exception as e:
+        print(f"⚠️ Media info indexing failed for {os.path.basename(path)}: {e}")
+
+def prefetch_media_info(path: str):
+    """
+    Starts `index_media` in the background (the InFlight map keeps the task referenced).
+    """
+    if os.path.exists(path):
+        return _indexing.start(os.path.abspath(path), lambda: index_media(path))
+    return None
+
+def media_info_stats() -> dict:
+    return {**media_index.stats(), "memo": len(_memo)}
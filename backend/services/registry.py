@@ -0,0 +1,162 @@
+# backend/services/registry.py
+import os
+import sys
+import time
+import asyncio
+import threading
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIG ---
+# Use "tiny" or "base" for speed (Hackathon). Use "medium" for accuracy.
+WHISPER_MODEL_SIZE = os.getenv("VOXEDIT_WHISPER_MODEL", "base")
+
+# Comma-separated services to load in the background at startup ("all" for every one)
+WARMUP = os.getenv("VOXEDIT_WARMUP", "")
+
+# ==========================================
+# 🧰 LAZY SERVICE REGISTRY
+# ==========================================
+class ServiceRegistry:
+    """
+    Heavy models and API clients, built on first use instead of at import.
+    Loads are thread-safe (callers run in worker threads) and timed for /ready.
+    A failed load is remembered and retried on the next `get`.
+    """
+    def __init__(self):
+        self.loaders = {}
+        self.values = {}
+        self.seconds = {}
+        self.errors = {}
+        self.locks = {}
+
+    def register(self, name: str, loader):
+        self.loaders[name] = loader
+        self.locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        if name in self.values:
+            return self.values[name]
+        with self.locks[name]:
+            if name not in self.values:
+                started = time.perf_counter()
+                try:
+                    self.values[name] = self.loaders[name]()
+                    self.errors.pop(name, None)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    raise
+                finally:
+                    self.seconds[name] = round(time.perf_counter() - started, 3)
+                print(f"🧰 Loaded {name} in {self.seconds[name]}s")
+        return self.values[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self.values
+
+    async def warm(self, names: list):
+        """
+        Loads `names` one after another in a worker thread; failures are logged, not raised.
+        """
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                print(f"⚠️ Warm-up of {name} failed: {e}")
+
+    def status(self) -> dict:
+        return {
+            name: {"loaded": name in self.values, "seconds": self.seconds.get(name), "error": self.errors.get(name)}
+            for name in self.loaders
+        }
+
+def warmup_targets() -> list:
+    names = [n.strip() for n in WARMUP.split(",") if n.strip()]
+    if "all" in names:
+        return list(registry.loaders)
+    return [n for n in names if n in registry.loaders]
+
+# =========================
+# LOADERS
+# =========================
+_whisper_loaded_on = None # (device, compute_type) the model actually runs on, once loaded
+
+@lru_cache(maxsize=1)
+def _detect_whisper_device():
+    # Asks CTranslate2 directly, so CPU-only deployments never import torch
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda", "float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
+
+def whisper_device():
+    """
+    (device, compute_type) of the loaded Whisper model (after a GPU failure that's the CPU),
+    or before the first load what it will try: ("cuda", "float16") with a GPU, else ("cpu", "int8").
+    """
+    return _whisper_loaded_on or _detect_whisper_device()
+
+def _load_whisper():
+    from faster_whisper import WhisperModel
+
+    global _whisper_loaded_on
+    device, compute_type = _detect_whisper_device()
+    print(f"🧠 Loading Whisper ({WHISPER_MODEL_SIZE}) on {device}...")
+    try:
+        model = WhisperModel(WHISPER_MODEL_SIZE, device=device, compute_type=compute_type)
+    except Exception:
+        print("⚠️ GPU Failed. Fallback to CPU...")
+        device, compute_type = "cpu", "int8"
+        model = WhisperModel(WHISPER_MODEL_SIZE, device=device, compute_type=compute_type)
+    _whisper_loaded_on = (device, compute_type)
+    return model
+
+def _load_elevenlabs():
+    from elevenlabs.client import ElevenLabs
+
+    return ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+
+def _load_gemini():
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("❌ GEMINI_API_KEY not found in .env")
+    genai.configure(api_key=api_key)
+    return genai
+
+registry = ServiceRegistry()
+registry.register("whisper", _load_whisper)
+registry.register("elevenlabs", _load_elevenlabs)
+registry.register("gemini", _load_gemini)
+
+def get_whisper():
+    return registry.get("whisper")
+
+def get_elevenlabs():
+    return registry.get("elevenlabs")
+
+def get_gemini():
+    return registry.get("gemini")
+
+# =========================
+# COLD START BENCHMARK
+# =========================
+if __name__ == "__main__":
+    # python -m services.registry [service ...]  (run from backend/)
+    # Times `import main` in a fresh interpreter, then each service's first load.
+    import subprocess
+
+    code = (
+        "import time; t = time.perf_counter(); import main; "
+        "print(f'import main: {time.perf_counter() - t:.2f}s'); "
+        "import sys; from services.registry import registry; "
+        "[registry.get(n) for n in sys.argv[1:]]; "
+        "[print(f'{n}: {s}s') for n, s in registry.seconds.items()]"
+    )
+    subprocess.run([sys.executable, "-c", code, *sys.argv[1:]], check=False)
@@ -0,0 +1,102 @@
+# backend/services/render_jobs.py
+import time
+import uuid
+import asyncio
+
+from services.render_pool import on_slot_acquired
+
+# How many finished jobs we remember for /jobs/{id} lookups
+MAX_FINISHED_JOBS = 200
+
+# ==========================================
+# 📋 RENDER JOB MODEL
+# ==========================================
+class RenderJob:
+    """
+    One background render. State goes queued -> running -> done | failed;
+    it stays queued until its first encode gets a render pool slot.
+    """
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    """
+    Keeps track of background renders and tells `notify` whenever one changes.
+    `notify` is an async callable receiving the job's dict.
+    """
+    def __init__(self, notify=None):
+        self.jobs: dict[str, RenderJob] = {}
+        self.notify = notify
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def submit(self, kind: str, work) -> RenderJob:
+        """
+        Starts `work(job)` in the background and returns the job right away.
+        `work` is an async callable that may call `job_manager.report(job, stats)`
+        and returns the result dict (or raises on failure).
+        """
+        job = RenderJob(kind)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, work))
+        self._prune()
+        return job
+
+    async def report(self, job: RenderJob, stats: dict):
+        job.progress = stats
+        await self._notify(job)
+
+    async def _run(self, job: RenderJob, work):
+        async def started():
+            if job.state == "queued":
+                job.state = "running"
+                await self._notify(job)
+
+        # Runs in its own task, so this only reaches the encodes started by `work`
+        on_slot_acquired.set(started)
+        try:
+            job.result = await work(job)
+            job.state = "done"
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        job.finished_at = time.time()
+        await self._notify(job)
+
+    async def _notify(self, job: RenderJob):
+        if not self.notify:
+            return
+        try:
+            await self.notify(job.to_dict())
+        except Exception as e:
+            print(f"⚠️ Job notify failed: {e}")
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.finished_at]
+        if len(finished) <= MAX_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda j: j.finished_at)
+        for j in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            del self.jobs[j.id]
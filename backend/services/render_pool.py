@@ -0,0 +1,194 @@
+# backend/services/render_pool.py
+import os
+import json
+import asyncio
+import contextvars
+from collections import deque
+
+import ffmpeg
+
+# --- CONFIG ---
+# Max FFmpeg encodes running at the same time. Extra jobs wait in arrival order.
+# Defaults to one slot per two cores so chunked renders can spread across the machine.
+MAX_RENDER_JOBS = int(os.getenv("VOXEDIT_RENDER_WORKERS", str(max(2, (os.cpu_count() or 2) // 2))))
+
+# Async callable awaited whenever an encode started from this context gets its pool slot.
+# Background jobs set it so they only count as running once an encode actually starts.
+on_slot_acquired = contextvars.ContextVar("on_slot_acquired", default=None)
+
+# ==========================================
+# 🏭 RENDER POOL (Bounded FIFO Executor)
+# ==========================================
+class RenderPool:
+    """
+    Runs FFmpeg as asyncio subprocesses so renders never block the event loop.
+    At most `max_jobs` encodes run at once; the rest queue fairly (FIFO).
+    """
+    def __init__(self, max_jobs: int):
+        self.max_jobs = max(1, max_jobs)
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    def stats(self) -> dict:
+        return {"max_jobs": self.max_jobs, "active": self.active, "queued": self.queue_depth}
+
+    async def _acquire(self):
+        # Fast path: free slot and nobody waiting ahead of us
+        if self.active < self.max_jobs and not self._waiters:
+            self.active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed to us right before the cancel landed; pass it on
+                self._release()
+            raise
+
+    def _release(self):
+        # Hand the slot directly to the next live waiter (keeps FIFO order)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    async def run(self, args: list, on_progress=None, duration: float = None):
+        """
+        Runs one FFmpeg command inside a pool slot.
+        Raises ffmpeg.Error on a non-zero exit, same as ffmpeg-python's .run().
+        If `on_progress` is given it is awaited with parsed `-progress` stats.
+        """
+        await self._acquire()
+        try:
+            callback = on_slot_acquired.get()
+            if callback:
+                try:
+                    await callback()
+                except Exception as e:
+                    print(f"⚠️ Slot callback failed: {e}")
+            if on_progress:
+                return await _exec_with_progress(args, on_progress, duration)
+            return await _exec(args)
+        finally:
+            self._release()
+
+render_pool = RenderPool(MAX_RENDER_JOBS)
+
+async def _exec(args: list):
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        # Don't leave orphaned encoders behind when a request goes away
+        proc.kill()
+        await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        raise ffmpeg.Error(args[0], stdout, stderr)
+    return stdout, stderr
+
+# ==========================================
+# 📈 PROGRESS PARSING (-progress pipe:1)
+# ==========================================
+def parse_progress_block(block: dict, duration: float = None) -> dict:
+    """
+    Turns one `key=value` block from FFmpeg's -progress output into
+    {out_time, percent, fps, speed, eta}. Fields FFmpeg hasn't reported yet are None.
+    """
+    out_time = None
+    raw_us = block.get("out_time_us") or block.get("out_time_ms") # both are microseconds
+    if raw_us and raw_us != "N/A":
+        out_time = max(0.0, int(raw_us) / 1_000_000)
+
+    try:
+        fps = float(block.get("fps", ""))
+    except ValueError:
+        fps = None
+
+    speed = None
+    raw_speed = block.get("speed", "").rstrip("x").strip()
+    if raw_speed and raw_speed != "N/A":
+        try:
+            speed = float(raw_speed)
+        except ValueError:
+            pass
+
+    percent, eta = None, None
+    done = block.get("progress") == "end"
+    if duration and duration > 0 and out_time is not None:
+        percent = 100.0 if done else min(99.9, out_time / duration * 100)
+        if speed:
+            eta = 0.0 if done else max(0.0, (duration - out_time) / speed)
+
+    return {"out_time": out_time, "percent": percent, "fps": fps, "speed": speed, "eta": eta, "done": done}
+
+async def _exec_with_progress(args: list, on_progress, duration: float = None):
+    # Ask FFmpeg for machine-readable progress on stdout (right after the binary name)
+    args = [args[0], '-progress', 'pipe:1', '-nostats', *args[1:]]
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr in parallel so a chatty encoder can't fill the pipe and stall
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    try:
+        block = {}
+        async for raw in proc.stdout:
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            block[key] = value
+            if key == 'progress':
+                try:
+                    await on_progress(parse_progress_block(block, duration))
+                except Exception as e:
+                    print(f"⚠️ Progress callback failed: {e}")
+                block = {}
+        stderr = await stderr_task
+        await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        stderr_task.cancel()
+        await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        raise ffmpeg.Error(args[0], b'', stderr)
+    return b'', stderr
+
+# =========================
+# PUBLIC HELPERS
+# =========================
+async def run_ffmpeg(stream, overwrite_output: bool = True, on_progress=None, duration: float = None):
+    """
+    Async drop-in for `stream.run(overwrite_output=True, quiet=True)`.
+    Pass `on_progress` (async callable) and the expected output `duration` for live stats.
+    """
+    args = stream.compile(overwrite_output=overwrite_output)
+    return await render_pool.run(args, on_progress=on_progress, duration=duration)
+
+async def probe(path: str) -> dict:
+    """
+    Async drop-in for `ffmpeg.probe(path)`.
+    Probes are cheap, so they skip the render queue instead of waiting behind encodes.
+    """
+    args = ['ffprobe', '-show_format', '-show_streams', '-of', 'json', path]
+    stdout, _ = await _exec(args)
+    return json.loads(stdout.decode('utf-8'))
+
+def render_stats() -> dict:
+    return render_pool.stats()
@@ -0,0 +1,154 @@
+# backend/services/segment_cache.py
+import os
+import json
+import uuid
+import math
+import asyncio
+import hashlib
+import shutil
+
+from services.disk_cache import DiskCache
+from services.render_pool import run_ffmpeg
+from services.audio_track import join_pieces
+from services.chunked_encode import CPU_BUDGET, CHUNK_WORKERS
+
+# --- CONFIG ---
+TEMP_DIR = "temp_storage"
+SEGMENT_DIR = os.path.join(TEMP_DIR, ".segments")
+SEGMENT_CACHE_MB = float(os.getenv("VOXEDIT_SEGMENT_CACHE_MB", "4096"))
+# Pieces are cut on a fixed source-time grid, so a segment whose edges move still reuses its middle
+GRID_SECONDS = float(os.getenv("VOXEDIT_SEGMENT_GRID", "30"))
+MIN_PIECE = 0.05
+
+# Every cached piece must share codec parameters to be joined by stream copy;
+# change this string whenever the piece encode settings change.
+# Pieces are video only: audio is encoded in one pass per render (see audio_track).
+ENCODE_PROFILE = "x264-ultrafast-crf20-yuv420p/video-only/ts-v2"
+VIDEO_OPTS = {'vcodec': 'libx264', 'preset': 'ultrafast', 'crf': 20, 'pix_fmt': 'yuv420p'}
+
+segment_cache = DiskCache("segments", max_bytes=int(SEGMENT_CACHE_MB * 1024 * 1024))
+
+# ==========================================
+# 🔑 KEYS
+# ==========================================
+def normalize_chain(actions: list) -> list:
+    """
+    Canonical form of a legacy action chain: known tools only, no-ops dropped,
+    params reduced to what changes the pixels/samples.
+    """
+    chain = []
+    for action in actions or []:
+        tool = (action.get("tool") or "").lower()
+        params = action.get("params") or {}
+        if tool == "speed":
+            factor = round(float(params.get("factor", 1.0)), 4)
+            if factor != 1.0:
+                chain.append({"tool": "speed", "params": {"factor": factor}})
+        elif tool == "filter":
+            ftype = (params.get("type") or "").lower()
+            if ftype not in ("", "none"):
+                chain.append({"tool": "filter", "params": {"type": ftype}})
+    return chain
+
+def chain_speed(chain: list) -> float:
+    return math.prod(a["params"]["factor"] for a in chain if a["tool"] == "speed")
+
+def segment_key(digest: str, start: float, end: float, chain: list) -> str:
+    payload = json.dumps([digest, round(start, 3), round(end, 3), chain, ENCODE_PROFILE], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def grid_pieces(start: float, end: float, grid: float = GRID_SECONDS) -> list:
+    """
+    Splits [start, end) at multiples of `grid` (absolute source time). Slivers shorter
+    than MIN_PIECE are merged into their neighbour.
+    """
+    cuts = [start]
+    boundary = (math.floor(start / grid) + 1) * grid
+    while boundary < end:
+        if boundary - cuts[-1] >= MIN_PIECE and end - boundary >= MIN_PIECE:
+            cuts.append(boundary)
+        boundary += grid
+    cuts.append(end)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def segment_cache_stats() -> dict:
+    return segment_cache.stats()
+
+# ==========================================
+# ♻️ INCREMENTAL RENDER
+# ==========================================
+async def render_pieces(output_path: str, pieces: list, on_progress=None, audio=None) -> bool:
+    """
+    `pieces`: [{"key", "duration", "build": fn(path, threads) -> video-only MPEG-TS output node}]
+    in output order. Reuses every cached piece, encodes only the missing ones (up to CHUNK_WORKERS
+    at once, sharing CPU_BUDGET threads like chunked_encode), then joins all of them with the
+    concat demuxer. `audio(audio_path)` (async,
+    optional) writes the render's audio track in one pass; it is muxed in at the join.
+    Raises ffmpeg.Error on failure.
+    """
+    cached = await asyncio.to_thread(lambda: {p["key"]: segment_cache.get(p["key"]) for p in pieces})
+    missing = {p["key"]: p for p in pieces if not cached[p["key"]]}
+    print(f"--- ♻️ Segment cache: reusing {len(pieces) - len(missing)}/{len(pieces)} pieces ---")
+
+    total = sum(p["duration"] for p in missing.values())
+    done = {key: 0.0 for key in missing}
+    os.makedirs(SEGMENT_DIR, exist_ok=True)
+    # Same budget as a chunked render: fewer pieces than workers -> more threads each
+    workers = max(1, min(len(missing), CHUNK_WORKERS))
+    threads = max(1, CPU_BUDGET // workers)
+    slots = asyncio.Semaphore(workers)
+
+    async def encode(key, piece):
+        path = os.path.join(SEGMENT_DIR, f"{key}.ts")
+        tmp_path = os.path.join(SEGMENT_DIR, f"{key}.{uuid.uuid4().hex}.part.ts")
+
+        async def report(stats):
+            if stats.get("out_time") is not None:
+                done[key] = min(stats["out_time"], piece["duration"])
+            if on_progress and total:
+                out_time = sum(done.values())
+                await on_progress({
+                    "out_time": out_time, "percent": min(99.9, out_time / total * 100),
+                    "fps": None, "speed": None, "eta": None, "done": False
+                })
+
+        try:
+            async with slots:
+                await run_ffmpeg(piece["build"](tmp_path, threads), on_progress=report, duration=piece["duration"])
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        await asyncio.to_thread(segment_cache.put, key, {"path": path, "duration": piece["duration"]}, path)
+        return key, path
+
+    work_dir = os.path.join(TEMP_DIR, f"segjoin_{uuid.uuid4()}")
+    os.makedirs(work_dir, exist_ok=True)
+    audio_path = os.path.join(work_dir, "audio.m4a") if audio else None
+    try:
+        jobs = [encode(k, p) for k, p in missing.items()] + ([audio(audio_path)] if audio else [])
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        paths = {key: entry["path"] for key, entry in cached.items() if entry}
+        paths.update(dict(results[:len(missing)]))
+
+        # Join. Pieces can be evicted by a concurrent render between here and the read,
+        # so copy-free hard links pin them for this job.
+        list_path = os.path.join(work_dir, "pieces.txt")
+        with open(list_path, 'w') as f:
+            for idx, piece in enumerate(pieces):
+                pinned = os.path.join(work_dir, f"piece_{idx:05d}.ts")
+                try:
+                    os.link(paths[piece["key"]], pinned)
+                except OSError:
+                    shutil.copyfile(paths[piece["key"]], pinned)
+                f.write(f"file '{os.path.abspath(pinned)}'\n")
+
+        await join_pieces(list_path, output_path, audio_path)
+        if on_progress:
+            await on_progress({"out_time": total, "percent": 100.0, "fps": None, "speed": None, "eta": 0.0, "done": True})
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,73 +1,43 @@
 # backend/services/sfx_gen.py
 import os
+import re
+import json
 import uuid
-import numpy as np
-import math
-from pydub import AudioSegment
-from pydub.generators import WhiteNoise, Sine, Square
-from elevenlabs.client import ElevenLabs
+import asyncio
+import hashlib
 from dotenv import load_dotenv
+from services.registry import get_elevenlabs
+from services.synth_engine import synthesize, render_file, wav_duration
+from services.disk_cache import DiskCache
+from services.inflight import InFlight
+from services.media_info import probe
 
 load_dotenv()
 
-client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
-
 TEMP_DIR = "temp_storage"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+PROMPT_INFLUENCE = 0.5 # Balanced between creativity and instruction
+
+# Generated effects by (text, duration, settings), with their duration so nobody re-probes them.
+# The files are timeline assets (their URLs live in saved projects), so entries don't own them:
+# eviction only forgets the index row, and a later miss re-adopts the file that is still there.
+SFX_CACHE_SIZE = int(os.getenv("VOXEDIT_SFX_CACHE_SIZE", "5000"))
+sfx_cache = DiskCache("sfx_index", max_entries=SFX_CACHE_SIZE)
+_generating = InFlight()
+
 # ==========================================
 # 🎹 SMART FALLBACK ENGINE (Local Synthesis)
 # ==========================================
-def generate_fallback_sfx(filepath: str, text: str, duration_ms: int = 1500):
+def generate_fallback_sfx(text: str, duration_ms: int = 1500):
     """
     Generates a procedural sound based on keywords so the demo never fails.
+    Rendered by the NumPy synth engine and cached per (recipe, duration, sample rate),
+    so repeats return the same WAV without any work.
     """
     print(f"⚠️ API Failed. Synthesizing local sound for: '{text}'")
-    text = text.lower()
-    
     try:
-        sound = None
-
-        # 1. Beeps / UI Sounds
-        if "beep" in text or "click" in text or "ping" in text:
-            # High pitched sine wave with fast decay
-            sound = Sine(880).to_audio_segment(duration=200).fade_out(100)
-        
-        # 2. Boom / Impact / Thunder
-        elif "boom" in text or "impact" in text or "thud" in text:
-            # Low frequency noise with heavy fade out
-            noise = WhiteNoise().to_audio_segment(duration=800)
-            sound = noise.low_pass_filter(200).fade_out(600).apply_gain(5)
-
-        # 3. Laser / Sci-Fi (The "Pew Pew")
-        elif "laser" in text or "shot" in text or "gun" in text:
-            # Generate a frequency slide (chirp) using numpy
-            sample_rate = 44100
-            duration_s = 0.3
-            t = np.linspace(0, duration_s, int(sample_rate * duration_s))
-            # Slide frequency from 800Hz down to 100Hz
-            frequency = np.linspace(800, 100, len(t))
-            waveform = np.sin(2 * np.pi * frequency * t) * 0.5
-            
-            # Convert numpy array to AudioSegment
-            audio_data = (waveform * 32767).astype(np.int16).tobytes()
-            sound = AudioSegment(audio_data, frame_rate=sample_rate, sample_width=2, channels=1)
-
-        # 4. Success / Notification
-        elif "success" in text or "correct" in text or "win" in text:
-            # Major Chord (C - E - G)
-            note1 = Sine(523.25).to_audio_segment(duration=400).fade_out(200) # C5
-            note2 = Sine(659.25).to_audio_segment(duration=400).fade_out(200) # E5
-            note3 = Sine(783.99).to_audio_segment(duration=800).fade_out(600) # G5
-            sound = note1.overlay(note2, position=100).overlay(note3, position=200)
-
-        # 5. Default (Ambient Swell)
-        else:
-            sound = WhiteNoise().to_audio_segment(duration=duration_ms).low_pass_filter(500).fade_in(500).fade_out(500)
-
-        # Normalize and Export
-        sound = sound.normalize()
-        sound.export(filepath, format="mp3")
+        filepath = synthesize(text, duration_ms / 1000)
         print(f"✅ Fallback SFX Generated: {filepath}")
         return filepath
 
@@ -75,55 +45,99 @@ def generate_fallback_sfx(filepath: str, text: str, duration_ms: int = 1500):
         print(f"❌ Fallback Gen Error: {e}")
         # Ultimate fail-safe: A tiny quiet blip
         try:
-            Sine(440).to_audio_segment(duration=100).export(filepath, format="mp3")
-            return filepath
+            return render_file("blip", 0.1)
         except:
             return None
 
 # ==========================================
 # 🌩️ MAIN GENERATOR (ElevenLabs)
 # ==========================================
-def generate_sound_effect(text: str, duration_seconds: float = None):
+def _request_sfx(text: str, duration_seconds: float, filepath: str):
     """
-    Generates a high-quality sound effect using ElevenLabs.
+    One ElevenLabs call written to `filepath` (via a temp file). Raises on failure. Blocking.
     """
-    filename = f"sfx_{uuid.uuid4()}.mp3"
-    filepath = os.path.join(TEMP_DIR, filename)
-
+    # Convert simple float to None if 0/empty to let AI decide optimal length
+    dur = duration_seconds if duration_seconds and duration_seconds > 0 else None
+
+    # 1. Call API
+    # Using the correct SDK method for SFX
+    result = get_elevenlabs().text_to_sound_effects.convert(
+        text=text,
+        duration_seconds=dur, 
+        prompt_influence=PROMPT_INFLUENCE
+    )
+
+    # 2. Save File
+    tmp_path = f"{filepath}.{uuid.uuid4().hex}.part"
     try:
-        print(f"✨ Generating High-Fidelity SFX: '{text}'...")
-
-        # Convert simple float to None if 0/empty to let AI decide optimal length
-        dur = duration_seconds if duration_seconds and duration_seconds > 0 else None
-
-        # 1. Call API
-        # Using the correct SDK method for SFX
-        result = client.text_to_sound_effects.convert(
-            text=text,
-            duration_seconds=dur, 
-            prompt_influence=0.5 # Balanced between creativity and instruction
-        )
-
-        # 2. Save File
-        with open(filepath, "wb") as f:
+        with open(tmp_path, "wb") as f:
             for chunk in result:
                 if chunk:
                     f.write(chunk)
-        
+
         # Verify file size (sometimes API returns empty valid streams on error)
-        if os.path.getsize(filepath) < 1000:
+        if os.path.getsize(tmp_path) < 1000:
              raise ValueError("Generated file is too small (API likely failed silently)")
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-        print(f"✅ SFX Saved: {filepath}")
-        return filepath
+# ==========================================
+# ⚡ CACHED + COALESCED GENERATION
+# ==========================================
+def sfx_cache_key(text: str, duration_seconds: float = None) -> str:
+    text = re.sub(r"\s+", " ", (text or "").strip())
+    dur = round(float(duration_seconds), 2) if duration_seconds and duration_seconds > 0 else None
+    payload = json.dumps([text, dur, PROMPT_INFLUENCE])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def sfx_cache_stats() -> dict:
+    return sfx_cache.stats()
 
+async def get_sound_effect(text: str, duration_seconds: float = None):
+    """
+    Returns {"path", "duration", "source"} for a sound effect, or None.
+    Identical requests are served from the cache (no API call, no probe); identical
+    concurrent requests share one upstream call.
+    """
+    key = sfx_cache_key(text, duration_seconds)
+    cached = await asyncio.to_thread(sfx_cache.get, key)
+    if cached and os.path.exists(cached["path"]):
+        print(f"⚡ SFX cache hit: '{text}'")
+        return cached
+    return await _generating.run(key, lambda: _generate(key, text, duration_seconds))
+
+async def _generate(key: str, text: str, duration_seconds: float):
+    filepath = os.path.join(TEMP_DIR, f"sfx_{key[:32]}.mp3")
+    try:
+        if os.path.exists(filepath):
+            # Index entry was evicted but the asset is still served: never replace it with a new take
+            print(f"⚡ SFX re-indexed: '{text}'")
+        else:
+            print(f"✨ Generating High-Fidelity SFX: '{text}'...")
+            await asyncio.to_thread(_request_sfx, text, duration_seconds, filepath)
     except Exception as e:
         print(f"❌ ElevenLabs SFX Error: {e}")
         print("🔄 Switching to Smart Fallback Mode...")
-        
-        # Calculate duration for fallback (default 1.5s if not specified)
         fb_dur = int(duration_seconds * 1000) if duration_seconds else 1500
-        return generate_fallback_sfx(filepath, text, fb_dur)
+        fallback = await asyncio.to_thread(generate_fallback_sfx, text, fb_dur)
+        if not fallback:
+            return None
+        # Not stored under this key: the next request should try the API again
+        return {"path": fallback, "duration": wav_duration(fallback), "source": "synth"}
+
+    # Probed once here; every later hit reads the duration from the cache entry
+    try:
+        info = await probe(filepath)
+        duration = float(info['format']['duration'])
+    except Exception:
+        duration = float(duration_seconds) if duration_seconds else 3.0
+
+    entry = {"path": filepath, "duration": duration, "source": "elevenlabs"}
+    await asyncio.to_thread(sfx_cache.put, key, entry)
+    print(f"✅ SFX Saved: {filepath}")
+    return entry
 
 # =========================
 # LOCAL TEST RUNNER
@@ -133,8 +147,8 @@ if __name__ == "__main__":
     
     # Test 1: Fallback Logic (Mocking a Laser)
     print("\n1. Testing 'Laser' Fallback (Procedural Generation)...")
-    path = generate_fallback_sfx(os.path.join(TEMP_DIR, "test_laser.mp3"), "laser gun shoot")
+    path = generate_fallback_sfx("laser gun shoot")
     
     # Test 2: Fallback Logic (Mocking a Success Chime)
     print("\n2. Testing 'Success' Fallback (Musical Generation)...")
-    path = generate_fallback_sfx(os.path.join(TEMP_DIR, "test_success.mp3"), "success notification")
\ No newline at end of file
+    path = generate_fallback_sfx("success notification")
\ No newline at end of file
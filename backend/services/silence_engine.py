@@ -0,0 +1,113 @@
+# backend/services/silence_engine.py
+import os
+import re
+
+import numpy as np
+from services.audio_cache import get_pcm
+
+# --- CONFIG ---
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+THRESHOLD_DB = float(os.getenv("VOXEDIT_SILENCE_DB", "-35"))  # frames quieter than this are silence
+MIN_GAP = float(os.getenv("VOXEDIT_SILENCE_MIN_GAP", "0.5"))  # shorter pauses are kept
+PADDING = float(os.getenv("VOXEDIT_SILENCE_PADDING", "0.15")) # breathing room around speech
+MIN_SPEECH = 0.1                                              # drop clicks / pops shorter than this
+
+# Commands that mean "just remove the silence" and nothing else
+SILENCE_COMMAND = re.compile(
+    r"^\s*(please\s+)?(remove|cut|trim|delete|strip|skip|get rid of)\s+(out\s+)?(all\s+)?(of\s+)?(the\s+)?"
+    r"((long|awkward|dead|empty)\s+)?(silence|silences|silent parts|pauses|gaps|dead air|quiet parts)"
+    r"(\s+(from|in)\s+(the|this|my)\s+(video|clip))?\s*(please)?\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+
+def is_silence_command(text: str) -> bool:
+    return bool(SILENCE_COMMAND.match(text or ""))
+
+# ==========================================
+# 🔇 VECTORIZED RMS VAD
+# ==========================================
+def frame_levels_db(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    Per-frame RMS level in dBFS, computed in one pass over a (frames, hop) view.
+    """
+    hop = int(sample_rate * frame_ms / 1000)
+    count = len(samples) // hop
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[:count * hop], dtype=np.float32).reshape(count, hop)
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / hop)
+    return 20 * np.log10(rms + 1e-10)
+
+def _runs(mask: np.ndarray):
+    # Start/end frame indices of every True run
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def find_speech_segments(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                         threshold_db: float = THRESHOLD_DB, min_gap: float = MIN_GAP,
+                         padding: float = PADDING, min_speech: float = MIN_SPEECH) -> list:
+    """
+    Returns segments_to_keep ([{start, end, label}]) covering the speech in `samples`.
+    Pauses shorter than `min_gap` are bridged; each segment is padded by `padding`.
+    """
+    frame_s = FRAME_MS / 1000
+    duration = len(samples) / sample_rate
+    voiced = frame_levels_db(samples, sample_rate) > threshold_db
+
+    starts, ends = _runs(voiced)
+    if len(starts) == 0:
+        return []
+
+    # Bridge short pauses: keep only boundaries where the gap is long enough
+    gaps = (starts[1:] - ends[:-1]) * frame_s
+    split = np.flatnonzero(gaps >= min_gap)
+    seg_starts = np.concatenate(([starts[0]], starts[split + 1])) * frame_s
+    seg_ends = np.concatenate((ends[split], [ends[-1]])) * frame_s
+
+    keep = (seg_ends - seg_starts) >= min_speech
+    seg_starts = np.clip(seg_starts[keep] - padding, 0, duration)
+    seg_ends = np.clip(seg_ends[keep] + padding, 0, duration)
+
+    # Padding may make neighbours overlap; merge them
+    segments = []
+    for s, e in zip(seg_starts.tolist(), seg_ends.tolist()):
+        if segments and s <= segments[-1]["end"]:
+            segments[-1]["end"] = round(e, 3)
+        else:
+            segments.append({"start": round(s, 3), "end": round(e, 3), "label": "Speech"})
+    return segments
+
+def find_silences(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                  threshold_db: float = THRESHOLD_DB, min_gap: float = MIN_GAP) -> list:
+    """
+    Returns [[start, end], ...] of silent stretches at least `min_gap` long.
+    """
+    frame_s = FRAME_MS / 1000
+    silent = frame_levels_db(samples, sample_rate) <= threshold_db
+    starts, ends = _runs(silent)
+    keep = (ends - starts) * frame_s >= min_gap
+    return [[round(s * frame_s, 2), round(e * frame_s, 2)] for s, e in zip(starts[keep].tolist(), ends[keep].tolist())]
+
+# ==========================================
+# ✂️ PLAN (same schema as the AI agent)
+# ==========================================
+async def remove_silence_plan(path: str, **params) -> dict:
+    """
+    Builds a `segments_to_keep` plan locally, without a model round trip.
+    """
+    samples = await get_pcm(path)
+    segments = find_speech_segments(samples, **params)
+    duration = len(samples) / SAMPLE_RATE
+    kept = sum(seg["end"] - seg["start"] for seg in segments)
+
+    if not segments:
+        explanation = "I couldn't detect any speech in this clip, so nothing was cut."
+    else:
+        explanation = (f"I found {len(segments)} speech segments and removed "
+                       f"{max(0.0, duration - kept):.1f}s of silence.")
+    return {
+        "explanation": explanation,
+        "segments_to_keep": segments,
+        "global_effects": {"speed": 1.0, "filter": "none"},
+    }
@@ -0,0 +1,180 @@
+# backend/services/smart_cut.py
+import os
+import uuid
+import shutil
+import asyncio
+import bisect
+
+import ffmpeg
+from services.render_pool import run_ffmpeg, probe as probe_uncached
+from services.media_info import probe, get_gop_index
+from services.audio_track import render_audio, join_pieces
+
+TEMP_DIR = "temp_storage"
+
+# --- CONFIG ---
+# Smart cut only pays off when most of the output can be stream-copied
+MIN_COPY_RATIO = 0.5
+# Boundary slivers shorter than this are not worth a separate encode
+MIN_PIECE = 0.02
+# Codecs we can re-encode boundaries into so they splice with copied GOPs
+ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+# ffprobe profile name -> encoder profile; edges must carry the source's profile and level
+PROFILES = {
+    "h264": {"Baseline": "baseline", "Constrained Baseline": "baseline", "Main": "main",
+             "High": "high", "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+    "hevc": {"Main": "main", "Main 10": "main10"},
+}
+
+def edge_encoder_opts(video_info: dict):
+    """
+    Encoder options for boundary pieces that reproduce the source stream's codec, profile,
+    level and pixel format, or None when the source can't be matched.
+    """
+    codec = video_info.get('codec_name')
+    profile = PROFILES.get(codec, {}).get(video_info.get('profile'))
+    level = video_info.get('level')
+    if codec not in ENCODERS or not profile or not level or int(level) <= 0:
+        return None
+
+    opts = {'vcodec': ENCODERS[codec], 'preset': 'veryfast', 'crf': 18, 'profile:v': profile,
+            'pix_fmt': video_info.get('pix_fmt', 'yuv420p')}
+    if codec == "h264":
+        opts['level'] = str(level)          # ffprobe reports 31 for 3.1, which x264 accepts
+    else:
+        opts['x265-params'] = f"level-idc={int(level) / 30:g}"   # HEVC level_idc is 30x the level
+    return opts
+
+async def _matches_source(piece_path: str, video_info: dict) -> bool:
+    # What the encoder actually wrote (x264 silently raises levels / drops profiles it can't honour)
+    info = await probe_uncached(piece_path)
+    encoded = next((s for s in info['streams'] if s['codec_type'] == 'video'), {})
+    return all(encoded.get(k) == video_info.get(k) for k in ('codec_name', 'profile', 'level', 'pix_fmt'))
+
+# ==========================================
+# 🧩 CUT PLANNER
+# ==========================================
+def plan_pieces(segments: list, keyframes: list) -> list:
+    """
+    Splits each kept segment into pieces:
+      ("encode", s, k1)  partial GOP before the first keyframe inside the segment
+      ("copy",   k1, k2) whole GOPs, stream-copied
+      ("encode", k2, e)  partial GOP after the last keyframe inside the segment
+    Segments with no full GOP inside are re-encoded whole.
+    """
+    pieces = []
+    for seg in segments:
+        start, end = float(seg['start']), float(seg['end'])
+
+        i = bisect.bisect_left(keyframes, start)
+        j = bisect.bisect_right(keyframes, end) - 1
+        first_key = keyframes[i] if i < len(keyframes) else None
+        last_key = keyframes[j] if j >= 0 else None
+
+        if first_key is None or last_key is None or first_key >= last_key:
+            pieces.append(("encode", start, end))
+            continue
+
+        if first_key - start > MIN_PIECE:
+            pieces.append(("encode", start, first_key))
+        pieces.append(("copy", first_key, last_key))
+        if end - last_key > MIN_PIECE:
+            pieces.append(("encode", last_key, end))
+    return pieces
+
+# ==========================================
+# ✂️ SMART CUT (Copy GOPs, Encode Edges)
+# ==========================================
+async def smart_cut(input_path: str, output_path: str, segments: list, on_progress=None) -> bool:
+    """
+    Stream-copies every GOP fully inside a kept segment and re-encodes only the
+    partial GOPs at the cut points (same codec / profile / level as the source), then joins
+    the video with the concat demuxer. Audio is encoded once over all kept segments, so the
+    only audio seams are the cuts themselves.
+    Returns False (without raising) when the input isn't suitable, so callers
+    can fall back to the full re-encode.
+    """
+    info = await probe(input_path)
+    video_info = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
+    encoder_opts = edge_encoder_opts(video_info) if video_info else None
+    if not encoder_opts:
+        return False
+    has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+
+    gops = await get_gop_index(input_path)
+    keyframes = gops["keyframes"]
+    frames_before = dict(zip(keyframes, gops["frames_before"]))
+    pieces = plan_pieces(segments, keyframes)
+
+    total = sum(end - start for _, start, end in pieces)
+    copied = sum(end - start for kind, start, end in pieces if kind == "copy")
+    if total <= 0 or copied / total < MIN_COPY_RATIO:
+        print(f"--- ✂️ Smart Cut skipped (only {copied:.1f}s of {total:.1f}s copyable) ---")
+        return False
+
+    print(f"--- ⚡ Smart Cut: copying {copied:.1f}s, encoding {total - copied:.1f}s ---")
+
+    work_dir = os.path.join(TEMP_DIR, f"smartcut_{uuid.uuid4()}")
+    os.makedirs(work_dir, exist_ok=True)
+    done = 0.0
+
+    async def render_piece(idx, kind, start, end):
+        nonlocal done
+        piece_path = os.path.join(work_dir, f"piece_{idx:05d}.ts")
+        # Video only; MPEG-TS repeats SPS/PPS in-band at every piece start
+        inp = ffmpeg.input(input_path, ss=start, t=end - start)
+        if kind == "copy":
+            # `-t` on a stream copy stops by DTS and lets reordered frames of the next GOP in;
+            # a frame count keeps the piece exactly [start, end)
+            frames = frames_before[end] - frames_before[start]
+            out = ffmpeg.output(inp['v:0'], piece_path, vcodec='copy', f='mpegts', **{'frames:v': frames})
+        else:
+            out = ffmpeg.output(inp['v:0'], piece_path, f='mpegts', **encoder_opts)
+        await run_ffmpeg(out)
+
+        done += end - start
+        if on_progress:
+            await on_progress({
+                "out_time": done, "percent": min(99.9, done / total * 100),
+                "fps": None, "speed": None, "eta": None, "done": False
+            })
+        return piece_path
+
+    audio_path = os.path.join(work_dir, "audio.m4a") if has_audio else None
+    jobs = [render_piece(idx, kind, start, end) for idx, (kind, start, end) in enumerate(pieces)]
+    if audio_path:
+        spans = [(float(seg['start']), float(seg['end']), 1.0) for seg in segments]
+        jobs.append(render_audio(input_path, spans, audio_path))
+
+    try:
+        # Pieces are independent; the render pool decides how many run at once
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        # Wait for every piece before bailing, so nothing still writes into work_dir
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        piece_paths = results[:len(pieces)]
+        encoded = [path for path, (kind, _, _) in zip(piece_paths, pieces) if kind == "encode"]
+        checks = await asyncio.gather(*[_matches_source(path, video_info) for path in encoded])
+        if not all(checks):
+            print("⚠️ Smart Cut skipped: re-encoded edges don't match the source's profile/level")
+            return False
+
+        list_path = os.path.join(work_dir, "pieces.txt")
+        with open(list_path, 'w') as f:
+            for path in piece_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        await join_pieces(list_path, output_path, audio_path)
+        if on_progress:
+            await on_progress({"out_time": total, "percent": 100.0, "fps": None, "speed": None, "eta": 0.0, "done": True})
+        return True
+
+    except ffmpeg.Error as e:
+        err_msg = e.stderr.decode(errors='ignore') if e.stderr else str(e)
+        print(f"⚠️ Smart Cut failed: {err_msg[-200:]}")
+        return False
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
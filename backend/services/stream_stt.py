@@ -0,0 +1,105 @@
+# backend/services/stream_stt.py
+import asyncio
+
+import numpy as np
+from services.silence_engine import frame_levels_db, FRAME_MS, THRESHOLD_DB
+from services.registry import get_whisper
+
+# --- CONFIG ---
+SAMPLE_RATE = 16000           # clients send 16 kHz mono int16 little-endian PCM
+PARTIAL_EVERY = 0.8           # seconds of new audio between partial transcripts
+ENDPOINT_SILENCE = 0.8        # trailing silence after speech that ends the utterance
+MAX_UTTERANCE = 30.0          # hard stop so a stuck mic can't grow the buffer forever
+VAD_HOP = SAMPLE_RATE * FRAME_MS // 1000   # samples per VAD frame (320 = 20 ms)
+
+# ==========================================
+# 🎙️ STREAMING TRANSCRIBER (faster-whisper + RMS VAD)
+# ==========================================
+class StreamingTranscriber:
+    """
+    Collects PCM frames from a WebSocket, emits partial transcripts while the user
+    talks, and a final one as soon as the VAD sees they stopped.
+    Uses the same faster-whisper model as subtitles (from the registry); no network needed.
+    """
+    def __init__(self, threshold_db: float = THRESHOLD_DB):
+        self.threshold_db = threshold_db
+        self.chunks = []
+        self.samples = 0
+        self.heard_speech = False
+        self.trailing_silence = 0.0
+        self._vad_pending = np.zeros(0, dtype=np.float32) # tail shorter than one VAD frame
+        self._since_partial = 0
+        self._partial_task = None
+
+    @property
+    def duration(self) -> float:
+        return self.samples / SAMPLE_RATE
+
+    def feed(self, pcm: bytes) -> bool:
+        """
+        Adds raw int16 PCM. Returns True once the utterance has ended (endpoint reached).
+        """
+        frame = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype='<i2').astype(np.float32) / 32768.0
+        if frame.size == 0:
+            return False
+        self.chunks.append(frame)
+        self.samples += frame.size
+        self._since_partial += frame.size
+
+        # VAD endpointing on the new audio only, in whole 20 ms frames: clients may send
+        # AudioWorklet-sized messages (128 / 256 samples), so the remainder waits for the next one
+        pending = np.concatenate((self._vad_pending, frame))
+        whole = len(pending) // VAD_HOP * VAD_HOP
+        self._vad_pending = pending[whole:]
+        if whole:
+            voiced = frame_levels_db(pending[:whole], SAMPLE_RATE) > self.threshold_db
+            frame_s = FRAME_MS / 1000
+            if voiced.any():
+                self.heard_speech = True
+                last_voiced = len(voiced) - 1 - int(np.flatnonzero(voiced)[-1])
+                self.trailing_silence = last_voiced * frame_s
+            else:
+                self.trailing_silence += whole / SAMPLE_RATE
+
+        if self.duration >= MAX_UTTERANCE:
+            return True
+        return self.heard_speech and self.trailing_silence >= ENDPOINT_SILENCE
+
+    def audio(self) -> np.ndarray:
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+
+    def partial_due(self) -> bool:
+        # One partial at a time; skip while the previous one is still decoding
+        busy = self._partial_task is not None and not self._partial_task.done()
+        return self.heard_speech and not busy and self._since_partial >= PARTIAL_EVERY * SAMPLE_RATE
+
+    def start_partial(self, on_text) -> asyncio.Task:
+        """
+        Transcribes what we have so far in the background and awaits `on_text(text)`.
+        """
+        self._since_partial = 0
+        audio = self.audio()
+
+        async def run():
+            text = await asyncio.to_thread(transcribe_pcm, audio, 1)
+            if text:
+                await on_text(text)
+
+        self._partial_task = asyncio.create_task(run())
+        return self._partial_task
+
+    async def finish(self) -> str:
+        if self._partial_task and not self._partial_task.done():
+            self._partial_task.cancel()
+        if not self.heard_speech:
+            return ""
+        return await asyncio.to_thread(transcribe_pcm, self.audio(), 5)
+
+def transcribe_pcm(audio: np.ndarray, beam_size: int = 1) -> str:
+    """
+    Blocking faster-whisper pass over 16 kHz float32 PCM -> run in a thread.
+    """
+    if audio.size < SAMPLE_RATE // 4:
+        return ""
+    segments, _ = get_whisper().transcribe(audio, beam_size=beam_size, condition_on_previous_text=False)
+    return " ".join(s.text.strip() for s in segments).strip()
@@ -1,30 +1,36 @@
 # backend/services/subtitle_gen.py
 import os
 import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import ffmpeg
-from faster_whisper import WhisperModel
-import torch
+import numpy as np
+from services.content_hash import file_digest
+from services.disk_cache import DiskCache
+from services.lineage import get_cut, remap_timed
+from services.silence_engine import find_silences
+from services.registry import get_whisper, whisper_device, WHISPER_MODEL_SIZE
 
 TEMP_DIR = "temp_storage"
 
 # --- CONFIG ---
-# Use "tiny" or "base" for speed (Hackathon). Use "medium" for accuracy.
-MODEL_SIZE = "base" 
+# The model itself is loaded lazily by the service registry (VOXEDIT_WHISPER_MODEL)
+MODEL_SIZE = WHISPER_MODEL_SIZE
+SAMPLE_RATE = 16000
 
-# Check for GPU
-device = "cuda" if torch.cuda.is_available() else "cpu"
-compute_type = "float16" if device == "cuda" else "int8"
+# Long uncached files are split at silences and transcribed by a pool of worker processes
+CHUNK_SECONDS = float(os.getenv("VOXEDIT_SUBTITLE_CHUNK_SECONDS", "300"))
+TRANSCRIBE_WORKERS = int(os.getenv("VOXEDIT_TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 4)))))
 
-print(f"🧠 Loading Whisper ({MODEL_SIZE}) on {device}...")
-try:
-    model = WhisperModel(MODEL_SIZE, device=device, compute_type=compute_type)
-except Exception:
-    print("⚠️ GPU Failed. Fallback to CPU...")
-    model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
+# Transcripts by (content hash, model size); derived cuts are remapped from their source's entry
+transcripts = DiskCache("transcripts", max_entries=500)
 
-def generate_subtitles(filename: str):
+def generate_subtitles(filename: str, audio=None):
     """
     Generates timestamped subtitles for a video.
+    `audio` is the file's cached 16 kHz PCM (see audio_cache); without it Whisper decodes the file.
+    Results are cached by content hash; a file cut from an already transcribed one is remapped, not re-run.
     Returns a list of segments: [{start, end, text}, ...]
     """
     input_path = os.path.join(TEMP_DIR, filename)
@@ -32,24 +38,112 @@ def generate_subtitles(filename: str):
         return None
 
     try:
+        digest = file_digest(input_path)
+        subtitle_data = cached_subtitles(digest)
+        if subtitle_data is not None:
+            print(f"⚡ Subtitles from cache: {filename}")
+            return subtitle_data
+
         print(f"🎬 Transcribing: {filename}...")
-        
-        # 1. Transcribe (Directly from video file works with faster-whisper!)
-        segments, info = model.transcribe(input_path, beam_size=5)
-
-        # 2. Format Results
-        subtitle_data = []
-        for segment in segments:
-            subtitle_data.append({
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text.strip(),
-                "confidence": segment.avg_logprob
-            })
+        spans = _split_at_silences(audio) if _can_parallelize(audio) else []
+
+        if len(spans) > 1:
+            # 1a. Long file: silence-aligned chunks in parallel worker processes, merged in order
+            print(f"🧩 {len(spans)} chunks across {TRANSCRIBE_WORKERS} workers")
+            pool = _get_pool()
+            futures = [pool.submit(_transcribe_span, audio.filename, a, b) for a, b in spans]
+            subtitle_data = [line for f in futures for line in f.result()]
+        else:
+            # 1b. Transcribe (Directly from video file works with faster-whisper!)
+            segments, info = get_whisper().transcribe(audio if audio is not None else input_path, beam_size=5)
+            subtitle_data = _format(segments)
 
+        transcripts.put(f"{digest}:{MODEL_SIZE}", {"subtitles": subtitle_data})
         print(f"✅ Generated {len(subtitle_data)} subtitle lines.")
         return subtitle_data
 
     except Exception as e:
         print(f"❌ Subtitle Error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def cached_subtitles(digest: str, depth: int = 0):
+    """
+    Cached transcript for `digest`, or one remapped from the file it was cut from (recursively).
+    """
+    entry = transcripts.get(f"{digest}:{MODEL_SIZE}")
+    if entry is not None:
+        return entry["subtitles"]
+    cut = get_cut(digest) if depth < 8 else None
+    if cut is None:
+        return None
+    source = cached_subtitles(cut["source"], depth + 1)
+    if source is None:
+        return None
+    subtitle_data = remap_timed(source, cut["spans"])
+    transcripts.put(f"{digest}:{MODEL_SIZE}", {"subtitles": subtitle_data})
+    return subtitle_data
+
+def _format(segments, offset: float = 0.0) -> list:
+    # 2. Format Results
+    return [{
+        "start": segment.start + offset,
+        "end": segment.end + offset,
+        "text": segment.text.strip(),
+        "confidence": segment.avg_logprob
+    } for segment in segments]
+
+# ==========================================
+# 🧩 PARALLEL CHUNKED TRANSCRIPTION
+# ==========================================
+def _can_parallelize(audio) -> bool:
+    # Workers re-open the memory-mapped PCM by path; one GPU is better served by a single model.
+    # Loading it first settles the device: a GPU that fails to load falls back to the CPU.
+    if whisper_device()[0] != "cpu":
+        get_whisper()
+    return (whisper_device()[0] == "cpu" and TRANSCRIBE_WORKERS > 1 and isinstance(audio, np.memmap)
+            and len(audio) > 2 * CHUNK_SECONDS * SAMPLE_RATE)
+
+def _split_at_silences(samples: np.ndarray) -> list:
+    """
+    [(start_sample, end_sample), ...] of roughly CHUNK_SECONDS each, cut in the middle of a pause
+    near every boundary so no word is split between two workers.
+    """
+    total = len(samples)
+    pauses = [(s + e) / 2 for s, e in find_silences(samples, min_gap=0.3)]
+    cuts, target = [0], CHUNK_SECONDS
+    while target < total / SAMPLE_RATE - CHUNK_SECONDS / 2:
+        near = [p for p in pauses if abs(p - target) <= CHUNK_SECONDS / 2 and p * SAMPLE_RATE > cuts[-1]]
+        cut = min(near, key=lambda p: abs(p - target)) if near else target
+        cuts.append(int(cut * SAMPLE_RATE))
+        target = cut + CHUNK_SECONDS
+    cuts.append(total)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Long-lived, so each worker loads its model once; spawn avoids forking CTranslate2 threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 2) // TRANSCRIBE_WORKERS)
+            _pool = ProcessPoolExecutor(TRANSCRIBE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(threads,))
+    return _pool
+
+_worker_model = None
+
+def _init_worker(threads: int):
+    from faster_whisper import WhisperModel
+
+    global _worker_model
+    _worker_model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=threads)
+
+def _transcribe_span(pcm_path: str, start: int, end: int) -> list:
+    """
+    Runs in a worker process: transcribes samples [start, end) of the shared PCM file.
+    """
+    samples = np.array(np.memmap(pcm_path, dtype=np.float32, mode='r')[start:end])
+    segments, _ = _worker_model.transcribe(samples, beam_size=5)
+    return _format(segments, offset=start / SAMPLE_RATE)
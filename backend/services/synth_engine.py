@@ -0,0 +1,239 @@
+# backend/services/synth_engine.py
+import os
+import wave
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# --- CONFIG ---
+SAMPLE_RATE = 44100
+SYNTH_VERSION = "v1"        # bump when a recipe changes so stale renders aren't served
+PEAK_DB = -1.0              # normalization target
+SFX_DIR = os.path.join("temp_storage", "sfx_cache")   # served under /files, so not a dot-dir
+
+# ==========================================
+# 🎛️ PRIMITIVES (whole-buffer NumPy, no per-sample Python)
+# ==========================================
+def timeline(duration: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    return np.arange(int(round(duration * sr)), dtype=np.float64) / sr
+
+def sine(freq: float, duration: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    return np.sin(2 * np.pi * freq * timeline(duration, sr))
+
+def square(freq: float, duration: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    return np.sign(sine(freq, duration, sr))
+
+def noise(duration: float, sr: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    # Seeded so a recipe always renders the same buffer (that's what makes it cacheable)
+    return np.random.default_rng(seed).uniform(-1.0, 1.0, int(round(duration * sr)))
+
+def chirp(f0: float, f1: float, duration: float, sr: int = SAMPLE_RATE, exponential: bool = False) -> np.ndarray:
+    """
+    Frequency sweep f0 -> f1 with a continuous phase (integral of the instantaneous frequency).
+    """
+    t = timeline(duration, sr)
+    if exponential:
+        k = (f1 / f0) ** (1 / duration)
+        phase = 2 * np.pi * f0 * (k ** t - 1) / np.log(k)
+    else:
+        phase = 2 * np.pi * (f0 * t + (f1 - f0) * t * t / (2 * duration))
+    return np.sin(phase)
+
+def biquad(samples: np.ndarray, kind: str, freq: float, q: float = 0.707, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    RBJ cookbook biquad ("lowpass", "highpass", "bandpass"), run by scipy's C lfilter.
+    """
+    from scipy.signal import lfilter # ~1s to import, so only when a sound is actually synthesized
+    w0 = 2 * np.pi * freq / sr
+    cos_w0, alpha = np.cos(w0), np.sin(w0) / (2 * q)
+    if kind == "lowpass":
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+    elif kind == "highpass":
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    elif kind == "bandpass":
+        b = [alpha, 0.0, -alpha]
+    else:
+        raise ValueError(f"Unknown biquad type: {kind}")
+    a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    return lfilter(np.divide(b, a[0]), np.divide(a, a[0]), samples)
+
+def envelope(n: int, attack: float = 0.0, release: float = 0.0, sr: int = SAMPLE_RATE, curve: float = 1.0) -> np.ndarray:
+    """
+    Linear (curve=1) or shaped attack / release gain ramps over `n` samples.
+    """
+    env = np.ones(n)
+    a, r = min(n, int(attack * sr)), min(n, int(release * sr))
+    if a:
+        env[:a] = np.linspace(0.0, 1.0, a, endpoint=False) ** curve
+    if r:
+        env[n - r:] *= np.linspace(1.0, 0.0, r) ** curve
+    return env
+
+def decay(n: int, seconds: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    # Exponential decay to -60 dB after `seconds`
+    return np.exp(-6.9078 * np.arange(n) / (seconds * sr))
+
+def mix(parts: list, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Sums (offset_seconds, samples) parts into one buffer.
+    """
+    length = max(int(offset * sr) + len(p) for offset, p in parts)
+    out = np.zeros(length)
+    for offset, p in parts:
+        start = int(offset * sr)
+        out[start:start + len(p)] += p
+    return out
+
+def normalize(samples: np.ndarray, peak_db: float = PEAK_DB) -> np.ndarray:
+    peak = np.abs(samples).max() if len(samples) else 0.0
+    return samples * (10 ** (peak_db / 20) / peak) if peak > 0 else samples
+
+# ==========================================
+# 🎹 RECIPES (keyword -> sound)
+# ==========================================
+def _beep(duration, sr):
+    s = sine(880, duration, sr)
+    return s * envelope(len(s), release=duration / 2, sr=sr)
+
+def _boom(duration, sr):
+    s = biquad(biquad(noise(duration, sr, seed=1), "lowpass", 200, sr=sr), "lowpass", 120, sr=sr)
+    body = sine(55, duration, sr) * decay(len(s), duration * 0.6, sr)
+    return (s * 4 + body) * envelope(len(s), attack=0.005, release=duration * 0.75, sr=sr)
+
+def _laser(duration, sr):
+    s = chirp(800, 100, duration, sr, exponential=True) * 0.5
+    return s * envelope(len(s), attack=0.002, release=duration * 0.5, sr=sr)
+
+def _success(duration, sr):
+    # Major Chord (C - E - G), staggered
+    notes = []
+    for offset, freq, length in [(0.0, 523.25, 0.4), (0.1, 659.25, 0.4), (0.2, 783.99, 0.8)]:
+        s = sine(freq, length, sr)
+        notes.append((offset, s * envelope(len(s), release=length * 0.6, sr=sr)))
+    return mix(notes, sr)
+
+def _ambient(duration, sr):
+    s = biquad(noise(duration, sr, seed=2), "lowpass", 500, sr=sr)
+    swell = min(0.5, duration / 3)
+    return s * envelope(len(s), attack=swell, release=swell, sr=sr)
+
+def _blip(duration, sr):
+    return sine(440, duration, sr) * 0.3
+
+# name -> (render(duration, sr), fixed duration or None to follow the request)
+RECIPES = {
+    "beep": (_beep, 0.2),
+    "boom": (_boom, 0.8),
+    "laser": (_laser, 0.3),
+    "success": (_success, 1.0),
+    "ambient": (_ambient, None),
+    "blip": (_blip, 0.1),
+}
+
+KEYWORDS = [
+    ("beep", ("beep", "click", "ping")),
+    ("boom", ("boom", "impact", "thud")),
+    ("laser", ("laser", "shot", "gun")),
+    ("success", ("success", "correct", "win")),
+]
+
+def choose_recipe(text: str) -> str:
+    text = (text or "").lower()
+    for name, words in KEYWORDS:
+        if any(w in text for w in words):
+            return name
+    return "ambient"
+
+# ==========================================
+# 🗄️ CACHED RENDERING (memory + disk)
+# ==========================================
+def _resolve(recipe: str, duration: float) -> float:
+    fixed = RECIPES[recipe][1]
+    return fixed if fixed else round(max(0.1, min(duration, 30.0)), 2)
+
+@lru_cache(maxsize=64)
+def render(recipe: str, duration: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Normalized float32 samples for (recipe, duration, sr); memoized and read-only.
+    """
+    samples = normalize(RECIPES[recipe][0](duration, sr)).astype(np.float32)
+    samples.flags.writeable = False
+    return samples
+
+_write_lock = threading.Lock()
+
+def render_file(recipe: str, duration: float, sr: int = SAMPLE_RATE) -> str:
+    """
+    Path of a 16-bit WAV for (recipe, duration, sr); rendered once, then served from disk.
+    """
+    duration = _resolve(recipe, duration)
+    path = os.path.join(SFX_DIR, f"{recipe}_{int(duration * 1000)}ms_{sr}_{SYNTH_VERSION}.wav")
+    if os.path.exists(path):
+        return path
+
+    pcm = (render(recipe, duration, sr) * 32767).astype('<i2').tobytes()
+    os.makedirs(SFX_DIR, exist_ok=True)
+    with _write_lock:
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with wave.open(tmp_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sr)
+            f.writeframes(pcm)
+        os.replace(tmp_path, path)
+    return path
+
+def synthesize(text: str, duration_seconds: float = 1.5, sr: int = SAMPLE_RATE) -> str:
+    return render_file(choose_recipe(text), duration_seconds or 1.5, sr)
+
+def wav_duration(path: str) -> float:
+    with wave.open(path, "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+# =========================
+# BENCHMARK (vs the old pydub fallback)
+# =========================
+if __name__ == "__main__":
+    # python -m services.synth_engine  (run from backend/)
+    import time
+    import shutil
+    import tempfile
+    from pydub import AudioSegment
+    from pydub.generators import WhiteNoise, Sine
+
+    def pydub_reference(name, out_path):
+        # What sfx_gen.generate_fallback_sfx used to do for each recipe
+        if name == "beep":
+            sound = Sine(880).to_audio_segment(duration=200).fade_out(100)
+        elif name == "boom":
+            sound = WhiteNoise().to_audio_segment(duration=800).low_pass_filter(200).fade_out(600).apply_gain(5)
+        elif name == "laser":
+            t = np.linspace(0, 0.3, int(44100 * 0.3))
+            wave_ = np.sin(2 * np.pi * np.linspace(800, 100, len(t)) * t) * 0.5
+            sound = AudioSegment((wave_ * 32767).astype(np.int16).tobytes(), frame_rate=44100, sample_width=2, channels=1)
+        elif name == "success":
+            n1 = Sine(523.25).to_audio_segment(duration=400).fade_out(200)
+            n2 = Sine(659.25).to_audio_segment(duration=400).fade_out(200)
+            n3 = Sine(783.99).to_audio_segment(duration=800).fade_out(600)
+            sound = n1.overlay(n2, position=100).overlay(n3, position=200)
+        else:
+            sound = WhiteNoise().to_audio_segment(duration=1500).low_pass_filter(500).fade_in(500).fade_out(500)
+        sound.normalize().export(out_path, format="mp3")
+
+    work = tempfile.mkdtemp()
+    SFX_DIR = os.path.join(work, "sfx")
+    print(f"{'recipe':<10}{'pydub+mp3':>12}{'numpy cold':>12}{'cached':>12}")
+    try:
+        for name in ["beep", "boom", "laser", "success", "ambient"]:
+            t0 = time.perf_counter()
+            pydub_reference(name, os.path.join(work, f"{name}.mp3"))
+            t1 = time.perf_counter()
+            render_file(name, 1.5)
+            t2 = time.perf_counter()
+            for _ in range(100):
+                render_file(name, 1.5)
+            t3 = time.perf_counter()
+            print(f"{name:<10}{(t1 - t0) * 1000:>10.1f}ms{(t2 - t1) * 1000:>10.1f}ms{(t3 - t2) * 10:>10.3f}ms")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,208 @@
+# backend/services/timeline.py
+import os
+import asyncio
+from fractions import Fraction
+from urllib.parse import unquote
+
+import ffmpeg
+from services.render_pool import run_ffmpeg
+from services.media_info import probe
+
+# --- CONFIG ---
+TEMP_DIR = "temp_storage"
+AUDIO_RATE = 48000
+DEFAULT_FPS = "30"
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "bmp"}
+IMAGE_SECONDS = 5.0 # stills have no length of their own
+
+# ==========================================
+# 📋 PROJECT NORMALIZATION
+# ==========================================
+def normalize_project(data) -> dict:
+    """
+    Accepts the legacy payload ([{filename, duration}], played back to back) or a full
+    project {"clips": [...], "audio": [...], "width", "height", "fps"} where every item has
+    {url | filename, start (timeline s), offset (in-point s), duration, volume?, muted?}.
+    Returns the full form; a missing start or duration stays None until `layout_track`
+    fills it in from the probed sources.
+    """
+    project = {"clips": data} if isinstance(data, list) else dict(data)
+    for track in ("clips", "audio"):
+        project[track] = [
+            {**item,
+             "start": float(item["start"]) if item.get("start") is not None else None,
+             "offset": float(item.get("offset") or 0),
+             "duration": float(item["duration"]) if item.get("duration") is not None else None}
+            for item in project.get(track) or []
+        ]
+    return project
+
+def layout_track(items: list, length_of) -> list:
+    """
+    Fills in one track: a missing duration plays the rest of the source, a known one is
+    clamped to what the source has after `offset` (so every part fills exactly its slot),
+    and a missing start follows the previous item. `length_of(item)` is the source length
+    in seconds (None when unbounded, e.g. a still image). Drops empty items.
+    """
+    cursor, laid_out = 0.0, []
+    for item in items:
+        length = length_of(item)
+        available = None if length is None else length - item["offset"]
+        duration = item["duration"]
+        if duration is None:
+            duration = IMAGE_SECONDS if available is None else available
+        elif available is not None:
+            duration = min(duration, available)
+        if duration <= 0:
+            continue
+        start = item["start"] if item["start"] is not None else cursor
+        laid_out.append({**item, "start": start, "duration": duration})
+        cursor = start + duration
+    return laid_out
+
+def resolve_media(item: dict, media_dir: str = TEMP_DIR):
+    """
+    Local path for a clip's "url" (anything under /files/) or "filename"; None if missing
+    or outside the media directory.
+    """
+    url = item.get("url") or ""
+    name = unquote(url.split("/files/", 1)[1]) if "/files/" in url else item.get("filename") or ""
+    root = os.path.realpath(media_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if not name or os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+def _is_image(path: str) -> bool:
+    return path.rsplit(".", 1)[-1].lower() in IMAGE_EXTENSIONS
+
+def _fps(stream: dict) -> Fraction:
+    try:
+        rate = Fraction(stream.get("avg_frame_rate") or stream.get("r_frame_rate") or DEFAULT_FPS)
+        return rate if 0 < rate <= 240 else Fraction(DEFAULT_FPS)
+    except (ValueError, ZeroDivisionError):
+        return Fraction(DEFAULT_FPS)
+
+# ==========================================
+# 🧮 TIMELINE COMPILER (one filtergraph, one pass)
+# ==========================================
+async def compile_timeline(project: dict, output_path: str, video_codec: str = 'libx264', preset: str = 'ultrafast'):
+    """
+    Builds one FFmpeg job for the whole project: each video clip is input-seeked to its
+    in-point, normalized to the output size / fps / pixel format only when it differs, and
+    concatenated with black for gaps; every audio source (clip audio + audio tracks) is
+    delayed to its timeline position and mixed over a silent bed with amix.
+    Returns (job, total_duration), or (None, 0) when there is nothing to render.
+    """
+    paths = {id(item): resolve_media(item) for item in project["clips"] + project["audio"]}
+    clips = [c for c in project["clips"] if paths[id(c)]]
+    extra_audio = [a for a in project["audio"] if paths[id(a)]]
+    if not clips:
+        return None, 0.0
+
+    # Probe each distinct file once
+    unique = sorted({paths[id(item)] for item in clips + extra_audio})
+    infos = dict(zip(unique, await asyncio.gather(*(probe(p) for p in unique))))
+
+    def streams_of(path, kind):
+        return [s for s in infos[path]['streams'] if s['codec_type'] == kind]
+
+    def source_length(path, kind):
+        # Length of the stream that part actually reads (the container can run a bit longer)
+        if _is_image(path):
+            return None
+        streams = streams_of(path, kind)
+        for value in ([streams[0].get('duration')] if streams else []) + [infos[path]['format'].get('duration')]:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+        return None
+
+    clips = layout_track(clips, lambda c: source_length(paths[id(c)], 'video'))
+    extra_audio = layout_track(extra_audio, lambda a: source_length(paths[id(a)], 'audio'))
+    if not clips:
+        return None, 0.0
+    clips.sort(key=lambda c: c["start"])
+    paths = {id(item): resolve_media(item) for item in clips + extra_audio} # laid-out copies
+
+    # Output format: explicit, else the first clip's
+    first_video = streams_of(paths[id(clips[0])], 'video')[0]
+    width = int(project.get("width") or first_video['width']) // 2 * 2
+    height = int(project.get("height") or first_video['height']) // 2 * 2
+    fps = Fraction(str(project["fps"])) if project.get("fps") else _fps(first_video)
+
+    def black(seconds):
+        return ffmpeg.input(f"color=c=black:s={width}x{height}:r={fps}", f='lavfi', t=seconds).video
+
+    # 1. VIDEO: seeked clips + black gaps, concatenated in timeline order
+    video_parts, audio_parts, cursor = [], [], 0.0
+    for clip in clips:
+        path = paths[id(clip)]
+        start = max(clip["start"], cursor) # overlapping clips: later one waits
+        if start - cursor > 0.01:
+            video_parts.append(black(start - cursor))
+
+        v_stream = streams_of(path, 'video')[0]
+        is_image = _is_image(path)
+        if is_image:
+            inp = ffmpeg.input(path, loop=1, t=clip["duration"], framerate=fps)
+        else:
+            inp = ffmpeg.input(path, ss=clip["offset"], t=clip["duration"])
+
+        v = inp.video.setpts('PTS-STARTPTS')
+        if (int(v_stream['width']), int(v_stream['height'])) != (width, height):
+            v = (v.filter('scale', w=width, h=height, force_original_aspect_ratio='decrease')
+                 .filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2'))
+        if v_stream.get('sample_aspect_ratio', '1:1') not in ('1:1', '0:1', None):
+            v = v.filter('setsar', 1)
+        if is_image or _fps(v_stream) != fps:
+            v = v.filter('fps', fps=str(fps))
+        if v_stream.get('pix_fmt') != 'yuv420p':
+            v = v.filter('format', 'yuv420p')
+        video_parts.append(v)
+
+        if streams_of(path, 'audio') and not clip.get("muted") and not is_image:
+            audio_parts.append((inp.audio, start, clip.get("volume")))
+        cursor = start + clip["duration"]
+
+    # Overlapping clips were pushed back, so the end is where the video landed (or the last audio)
+    total = max([cursor] + [a["start"] + a["duration"] for a in extra_audio])
+    if total - cursor > 0.01:
+        video_parts.append(black(total - cursor))
+
+    video = video_parts[0] if len(video_parts) == 1 else ffmpeg.concat(*video_parts, v=1, a=0)
+
+    # 2. AUDIO: extra tracks (SFX, music, voice) at their timeline positions
+    for item in extra_audio:
+        path = paths[id(item)]
+        if streams_of(path, 'audio') and not item.get("muted"):
+            inp = ffmpeg.input(path, ss=item["offset"], t=item["duration"])
+            audio_parts.append((inp.audio, item["start"], item.get("volume")))
+
+    bed = ffmpeg.input(f"anullsrc=r={AUDIO_RATE}:cl=stereo", f='lavfi', t=total).audio
+    mixed = [bed]
+    for stream, start, volume in audio_parts:
+        # amix takes the smallest common layout, so one mono source would fold the mix to mono
+        a = (stream.filter('asetpts', 'PTS-STARTPTS')
+             .filter('aformat', sample_rates=AUDIO_RATE, channel_layouts='stereo'))
+        if volume is not None and float(volume) != 1.0:
+            a = a.filter('volume', float(volume))
+        if start > 0:
+            a = a.filter('adelay', delays=str(int(round(start * 1000))), all=1)
+        mixed.append(a)
+    # normalize=0: a mix shouldn't turn every track down by 1/n
+    audio = mixed[0] if len(mixed) == 1 else ffmpeg.filter(
+        mixed, 'amix', inputs=len(mixed), duration='first', dropout_transition=0, normalize=0)
+
+    job = ffmpeg.output(video, audio, output_path, vcodec=video_codec, preset=preset,
+                        acodec='aac', ar=AUDIO_RATE, pix_fmt='yuv420p', movflags='faststart', t=total)
+    return job, total
+
+async def render_timeline(project: dict, output_path: str, video_codec: str = 'libx264',
+                          preset: str = 'ultrafast', on_progress=None) -> bool:
+    job, total = await compile_timeline(project, output_path, video_codec, preset)
+    if job is None:
+        return False
+    await run_ffmpeg(job, on_progress=on_progress, duration=total)
+    return True
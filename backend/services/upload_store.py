@@ -0,0 +1,80 @@
+# backend/services/upload_store.py
+import os
+import re
+import glob
+import uuid
+import asyncio
+import hashlib
+
+from services.content_hash import register_digest
+from services.disk_cache import DiskCache
+
+# --- CONFIG ---
+UPLOAD_CHUNK = 8 * 1024 * 1024   # large reads: fewer thread hops, hashing stays I/O bound
+
+# Stored name -> the names users uploaded it as (display only; the content hash is the identity)
+upload_names = DiskCache("uploads")
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return ext if re.fullmatch(r"[a-z0-9]{1,8}", ext) else "bin"
+
+def _write_block(f, h, block: bytes):
+    h.update(block)
+    f.write(block)
+
+# ==========================================
+# 📥 CONTENT-ADDRESSED UPLOADS
+# ==========================================
+async def save_upload(upload, directory: str) -> dict:
+    """
+    Streams a FastAPI UploadFile to `directory` in UPLOAD_CHUNK blocks (disk writes and
+    hashing run in a worker thread), then stores it as "<sha256>.<ext>".
+    Identical content uploaded again reuses the existing file.
+    Returns {"filename", "digest", "name", "size", "deduplicated"}.
+    """
+    staging = os.path.join(directory, ".incoming")
+    os.makedirs(staging, exist_ok=True)
+    tmp_path = os.path.join(staging, f"{uuid.uuid4().hex}.part")
+    h = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                block = await upload.read(UPLOAD_CHUNK)
+                if not block:
+                    break
+                size += len(block)
+                await asyncio.to_thread(_write_block, f, h, block)
+
+        digest = h.hexdigest()
+        existing = glob.glob(os.path.join(directory, f"{digest}.*"))
+        if existing:
+            # Same bytes as an earlier upload: keep one copy (and every cache built for it)
+            path = existing[0]
+            os.remove(tmp_path)
+        else:
+            path = os.path.join(directory, f"{digest}.{_extension(upload.filename)}")
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    register_digest(path, digest)
+    filename = os.path.basename(path)
+    await asyncio.to_thread(_remember_name, filename, digest, upload.filename, size)
+    return {"filename": filename, "digest": digest, "name": upload.filename,
+            "size": size, "deduplicated": bool(existing)}
+
+def _remember_name(filename: str, digest: str, name: str, size: int):
+    entry = upload_names.get(filename) or {"digest": digest, "size": size, "names": []}
+    if name and name not in entry["names"]:
+        entry["names"].append(name)
+    upload_names.put(filename, entry)
+
+def upload_info(filename: str):
+    """
+    {"digest", "size", "names"} for a stored upload, or None.
+    """
+    return upload_names.get(filename)
@@ -5,12 +5,40 @@ import uuid
 import subprocess
 import json
 import math
+import asyncio
+from fractions import Fraction
 from functools import lru_cache
+from services.render_pool import run_ffmpeg
+from services.media_info import probe, get_keyframes
+from services.smart_cut import smart_cut
+from services.chunked_encode import should_chunk, split_range, split_segments, encode_chunks
+from services.lineage import record_cut
+from services.timeline import normalize_project, render_timeline
+from services.content_hash import file_digest
+from services.audio_track import render_audio, atempo
+from services.segment_cache import (normalize_chain, chain_speed, segment_key, grid_pieces,
+                                    render_pieces, VIDEO_OPTS)
 
 # Define where temporary files go
 TEMP_DIR = "temp_storage"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Stream-copy whole GOPs and only re-encode cut boundaries (set to 0 to always re-encode)
+SMART_CUT = os.getenv("VOXEDIT_SMART_CUT", "1") == "1"
+# Segments closer than this share one seeked input (decoding a short gap beats opening the file again)
+SEEK_GAP = float(os.getenv("VOXEDIT_SEEK_GAP", "5"))
+# Re-encode only pieces whose (source, range, actions) changed since an earlier render
+SEGMENT_CACHE = os.getenv("VOXEDIT_SEGMENT_CACHE", "1") == "1"
+# Renders long enough to chunk (see chunked_encode.should_chunk): "cache" goes through the segment
+# cache first (its missing pieces are encoded in parallel under the same CPU budget), "chunked"
+# skips the cache and splits the render into keyframe-aligned chunks.
+LONG_RENDER = os.getenv("VOXEDIT_LONG_RENDER", "cache")
+
+# Preview renders: capped size / frame rate / bitrate, for checking a command before the real render
+PREVIEW_HEIGHT = int(os.getenv("VOXEDIT_PREVIEW_HEIGHT", "480"))
+PREVIEW_FPS = int(os.getenv("VOXEDIT_PREVIEW_FPS", "24"))
+PREVIEW_BITRATE = os.getenv("VOXEDIT_PREVIEW_BITRATE", "1M")
+
 @lru_cache(maxsize=1)
 def get_hardware_encoder():
     """
@@ -45,37 +73,82 @@ def get_hardware_encoder():
 # ==========================================
 # 🧠 SMART STITCHING (Self-Healing)
 # ==========================================
-async def execute_smart_stitch(input_path, output_path, segments):
+async def execute_smart_stitch(input_path, output_path, segments, on_progress=None):
     print(f"--- ✂️ Smart Stitching {len(segments)} segments ---")
-    
-    # 1. Attempt with Best Encoder
-    video_codec, preset = get_hardware_encoder()
-    
-    success = await _run_stitch_pass(input_path, output_path, segments, video_codec, preset)
+
+    # Segments may carry their own legacy actions (speed / filter); those need pixels re-encoded
+    has_effects = any(normalize_chain(seg.get('actions')) for seg in segments)
+
+    # 0. Smart Cut: keep GOPs as-is, encode only the edges
+    if SMART_CUT and not has_effects:
+        try:
+            if await smart_cut(input_path, output_path, segments, on_progress):
+                return True
+        except Exception as e:
+            print(f"⚠️ Smart Cut unavailable ({e}). Re-encoding instead...")
+
+    # First call shells out to ffmpeg, keep it off the loop
+    video_codec, preset = await asyncio.to_thread(get_hardware_encoder)
+    total = sum((end - start) / speed for start, end, speed in _audio_spans(segments))
+
+    # 0b. Incremental: reuse every unchanged piece from earlier renders
+    if use_segment_cache(total, video_codec):
+        try:
+            if await render_cached_segments(input_path, output_path, segments, on_progress=on_progress):
+                return True
+        except Exception as e:
+            print(f"⚠️ Segment cache render failed ({e}). Re-encoding in one pass...")
+
+    # 1. Attempt with Best Encoder (chunked in parallel when long enough)
+    success = await _run_stitch_pass(input_path, output_path, segments, video_codec, preset, on_progress)
     
     # 2. Fallback to CPU if HW fails (Self-Healing)
     if not success and video_codec != 'libx264':
         print("⚠️ HW Encoder Failed! Switching to CPU (libx264)...")
-        success = await _run_stitch_pass(input_path, output_path, segments, 'libx264', 'ultrafast')
+        success = await _run_stitch_pass(input_path, output_path, segments, 'libx264', 'ultrafast', on_progress)
         
     return success
 
-async def _run_stitch_pass(input_path, output_path, segments, video_codec, preset):
-    try:
-        # Probe Input
-        probe = ffmpeg.probe(input_path)
-        video_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-        src_w = int(video_info['width'])
-        src_h = int(video_info['height'])
-        has_audio = any(s['codec_type'] == 'audio' for s in probe['streams'])
-        
-        inp = ffmpeg.input(input_path)
-        concat_parts = [] 
+def use_segment_cache(duration: float, video_codec: str) -> bool:
+    """
+    Whether a render of `duration` output seconds goes through the segment cache (see LONG_RENDER).
+    """
+    return SEGMENT_CACHE and not (LONG_RENDER == "chunked" and should_chunk(duration, video_codec))
+
+def _seek_groups(segments):
+    """
+    Groups consecutive segments that are close in the source, so each group is read
+    through one input-seeked ffmpeg input instead of decoding the file from zero.
+    """
+    groups = []
+    for seg in segments:
+        start, end = float(seg['start']), float(seg['end'])
+        span = (start, end, normalize_chain(seg.get('actions')))
+        last = groups[-1] if groups else None
+        if last and last[-1][1] <= start < last[-1][1] + SEEK_GAP:
+            last.append(span)
+        else:
+            groups.append([span])
+    return groups
+
+def _stitch_graph(input_path, segments, src_w, src_h, has_audio):
+    """
+    Builds the seek/trim/concat graph for `segments` (source times, each optionally with
+    its own 'actions': speed / filter, applied to that segment only).
+    Every group of nearby segments gets its own `-ss`/`-t` input, so FFmpeg only
+    decodes the kept spans (plus gaps shorter than SEEK_GAP) instead of everything before them.
+    Returns the output streams: [video] or [video, audio].
+    """
+    concat_parts = [] 
+
+    for group in _seek_groups(segments):
+        base = group[0][0]
+        # Re-encoding, so input seeking is frame accurate (FFmpeg decodes from the prior keyframe and drops up to `ss`)
+        inp = ffmpeg.input(input_path, ss=base, t=group[-1][1] - base)
+
+        for seg_start, seg_end, chain in group:
+            start, end = seg_start - base, seg_end - base
 
-        for seg in segments:
-            start = float(seg['start'])
-            end = float(seg['end'])
-            
             # VIDEO: Trim + Reset PTS + Force Source Resolution
             v = (
                 inp.video
@@ -84,26 +157,64 @@ async def _run_stitch_pass(input_path, output_path, segments, video_codec, prese
                 .filter('scale', w=src_w, h=src_h)
                 .filter('setsar', 1) 
             )
-            concat_parts.append(v)
             
             # AUDIO: Trim + Reset PTS
+            a = None
             if has_audio:
                 a = (
                     inp.audio
                     .filter_('atrim', start=start, end=end)
                     .filter_('asetpts', 'PTS-STARTPTS')
                 )
-                concat_parts.append(a)
 
-        # Concatenate
-        if has_audio:
-            joined = ffmpeg.concat(*concat_parts, v=1, a=1).node
-            out = ffmpeg.output(joined[0], joined[1], output_path, vcodec=video_codec, preset=preset, acodec='aac')
-        else:
-            joined = ffmpeg.concat(*concat_parts, v=1, a=0).node
-            out = ffmpeg.output(joined[0], output_path, vcodec=video_codec, preset=preset)
+            # Per-segment effects from the plan
+            v, a = _apply_actions(v, a, chain)
+            concat_parts += [v, a] if has_audio else [v]
 
-        out.run(overwrite_output=True, quiet=True)
+    # Concatenate
+    joined = ffmpeg.concat(*concat_parts, v=1, a=1 if has_audio else 0).node
+    return [joined[0], joined[1]] if has_audio else [joined[0]]
+
+def _audio_spans(segments, actions=None):
+    # (start, end, speed) per segment, for the one-pass audio track of a chunked / pieced render
+    return [(float(seg['start']), float(seg['end']),
+             chain_speed(normalize_chain(list(actions or []) + list(seg.get('actions') or []))))
+            for seg in segments]
+
+async def _run_stitch_pass(input_path, output_path, segments, video_codec, preset, on_progress=None):
+    try:
+        # Probe Input
+        info = await probe(input_path)
+        video_info = next(s for s in info['streams'] if s['codec_type'] == 'video')
+        src_w = int(video_info['width'])
+        src_h = int(video_info['height'])
+        has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+        audio_opts = {'acodec': 'aac'} if has_audio else {}
+
+        total = sum((end - start) / speed for start, end, speed in _audio_spans(segments))
+
+        # Long CPU renders: encode groups of segments in parallel, then join losslessly
+        if should_chunk(total, video_codec):
+            groups = split_segments(segments, await get_keyframes(input_path))
+            if len(groups) > 1:
+                def chunk_builder(group, duration):
+                    def build(chunk_path, threads):
+                        # Inputs seek to the group's segments, so each worker only decodes its own span;
+                        # capped at the exact length so retimed chunks stay in step with the audio
+                        video = _stitch_graph(input_path, group, src_w, src_h, False)[0]
+                        return ffmpeg.output(video, chunk_path, vcodec=video_codec, preset=preset,
+                                             threads=threads, f='mpegts', t=duration)
+                    return build
+
+                durations = [sum((end - start) / speed for start, end, speed in _audio_spans(g)) for g in groups]
+                audio = (lambda path: render_audio(input_path, _audio_spans(segments), path)) if has_audio else None
+                return await encode_chunks(output_path, [chunk_builder(g, d) for g, d in zip(groups, durations)], durations,
+                                           on_progress, audio=audio)
+
+        streams = _stitch_graph(input_path, segments, src_w, src_h, has_audio)
+        out = ffmpeg.output(*streams, output_path, vcodec=video_codec, preset=preset, **audio_opts)
+
+        await run_ffmpeg(out, on_progress=on_progress, duration=total)
         return True
 
     except ffmpeg.Error as e:
@@ -112,88 +223,247 @@ async def _run_stitch_pass(input_path, output_path, segments, video_codec, prese
         print(f"NVIDIA NVENC is not Detected skiping the NVIDIA acceleration") # Print first 200 chars
         return False
 
+# ==========================================
+# ♻️ CACHED SEGMENT RENDER
+# ==========================================
+async def render_cached_segments(input_path, output_path, segments, actions=None, on_progress=None) -> bool:
+    """
+    Renders `segments` (each optionally with its own 'actions', applied after the shared
+    `actions`) as grid-aligned video pieces cached by (source hash, range, action chain),
+    so an edit only re-encodes what changed. The audio track is encoded in one pass.
+    """
+    info = await probe(input_path)
+    has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+    digest = await asyncio.to_thread(file_digest, input_path)
+
+    pieces = []
+    for seg in segments:
+        chain = normalize_chain(list(actions or []) + list(seg.get('actions') or []))
+        speed = chain_speed(chain)
+        for start, end in grid_pieces(float(seg['start']), float(seg['end'])):
+            pieces.append({
+                "key": segment_key(digest, start, end, chain),
+                "duration": (end - start) / speed,
+                "build": _piece_builder(input_path, start, end, chain),
+            })
+    if not pieces:
+        return False
+    audio = (lambda path: render_audio(input_path, _audio_spans(segments, actions), path)) if has_audio else None
+    return await render_pieces(output_path, pieces, on_progress, audio=audio)
+
+def _piece_builder(input_path, start, end, chain):
+    def build(piece_path, threads):
+        # Input seek: only the piece's own span is decoded
+        inp = ffmpeg.input(input_path, ss=start, t=end - start)
+        v, _ = _apply_actions(inp.video, None, chain)
+        # Capped at the exact output length, so retimed pieces stay in step with the one-pass audio
+        return ffmpeg.output(v, piece_path, f='mpegts', t=(end - start) / chain_speed(chain),
+                             threads=threads, **VIDEO_OPTS)
+    return build
+
+# ==========================================
+# 👀 PREVIEW RENDER (fast, low resolution)
+# ==========================================
+async def render_preview(input_path, output_path, segments, actions=None, on_progress=None) -> bool:
+    """
+    One pass over input-seeked segments, scaled to PREVIEW_HEIGHT and PREVIEW_FPS before
+    any effect runs, encoded at a capped bitrate. A segment 'end' of None means end of file.
+    """
+    info = await probe(input_path)
+    video_info = next(s for s in info['streams'] if s['codec_type'] == 'video')
+    has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+    src_w, src_h = int(video_info['width']), int(video_info['height'])
+    src_dur = float(info['format'].get('duration', 0) or 0)
+
+    height = min(PREVIEW_HEIGHT, src_h) // 2 * 2
+    width = max(2, round(src_w * height / src_h / 2) * 2)
+    try:
+        src_fps = float(Fraction(video_info.get('avg_frame_rate') or '0'))
+    except ZeroDivisionError:
+        src_fps = 0.0
+
+    parts, total = [], 0.0
+    for seg in segments:
+        start = float(seg['start'])
+        end = float(seg['end']) if seg.get('end') is not None else src_dur
+        chain = normalize_chain(list(actions or []) + list(seg.get('actions') or []))
+
+        inp = ffmpeg.input(input_path, ss=start, t=end - start)
+        v = inp.video.filter('scale', width, height).filter('setsar', 1)
+        if src_fps > PREVIEW_FPS or not src_fps:
+            v = v.filter('fps', fps=PREVIEW_FPS)
+        v, a = _apply_actions(v, inp.audio if has_audio else None, chain)
+        parts += [v, a] if has_audio else [v]
+        total += (end - start) / chain_speed(chain)
+
+    if not parts:
+        return False
+    per_segment = 2 if has_audio else 1
+    if len(parts) > per_segment:
+        joined = ffmpeg.concat(*parts, v=1, a=1 if has_audio else 0).node
+        parts = [joined[i] for i in range(per_segment)]
+
+    audio_opts = {'acodec': 'aac', 'audio_bitrate': '96k'} if has_audio else {}
+    out = ffmpeg.output(
+        *parts, output_path, vcodec='libx264', preset='ultrafast', pix_fmt='yuv420p',
+        video_bitrate=PREVIEW_BITRATE, maxrate=PREVIEW_BITRATE, bufsize=PREVIEW_BITRATE,
+        movflags='faststart', **audio_opts
+    )
+    await run_ffmpeg(out, on_progress=on_progress, duration=total)
+    return True
+
+# ==========================================
+# 🛠️ LEGACY TOOLS
+# ==========================================
+def _speed_factor(actions: list) -> float:
+    factor = 1.0
+    for action in actions:
+        if action.get("tool") == "speed":
+            factor *= float(action.get("params", {}).get("factor", 1.0))
+    return factor
+
+def _apply_actions(video, audio, actions: list):
+    """
+    Applies legacy tool actions (speed, color filters) to a video/audio pair.
+    `audio` is None when the source has no audio track.
+    """
+    for action in actions:
+        tool = action.get("tool")
+        params = action.get("params", {})
+
+        if tool == "speed":
+            factor = float(params.get("factor", 1.0))
+            video = video.filter('setpts', f'{1/factor}*PTS')
+            
+            if audio is not None:
+                audio = atempo(audio, factor) # chained for extreme speeds
+        
+        elif tool == "filter":
+            ftype = params.get("type", "").lower()
+            if ftype == "grayscale": video = video.filter('hue', s=0)
+            elif ftype == "sepia": video = video.filter('colorchannelmixer', rr=0.393, rg=0.769, rb=0.189, gr=0.349, gg=0.686, gb=0.168, br=0.272, bg=0.534, bb=0.131)
+            elif ftype == "warm": video = video.filter('eq', saturation=1.3, contrast=1.1, gamma_r=1.1)
+
+    return video, audio
+
 # ==========================================
 # ⚙️ MAIN PROCESSOR (Legacy Tools + Smart)
 # ==========================================
-async def process_video(input_path: str, actions: list, clip_start: float = 0.0, clip_duration: float = None):
+async def process_video(input_path: str, actions: list, clip_start: float = 0.0, clip_duration: float = None,
+                        on_progress=None, preview: bool = False):
+    """
+    Renders the edit. `preview=True` gives a quick low-resolution version (see render_preview).
+    """
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    output_filename = f"processed_{uuid.uuid4()}.mp4"
+    output_filename = f"{'preview' if preview else 'processed'}_{uuid.uuid4()}.mp4"
     output_path = os.path.join(TEMP_DIR, output_filename)
 
     try:
         # Detect Smart Stitch Mode
         is_smart_stitch = len(actions) > 0 and "start" in actions[0] and "tool" not in actions[0]
+        cut_spans = None # set when the output is only removed time (lets transcripts be remapped)
+
+        if preview:
+            if is_smart_stitch:
+                segments, shared = actions, []
+            else:
+                end = clip_start + clip_duration if clip_duration else None
+                segments, shared = [{"start": clip_start, "end": end}], actions
+            if not await render_preview(input_path, output_path, segments, shared, on_progress):
+                raise ValueError("Nothing to preview")
 
-        if is_smart_stitch:
-            success = await execute_smart_stitch(input_path, output_path, actions)
+        elif is_smart_stitch:
+            success = await execute_smart_stitch(input_path, output_path, actions, on_progress)
             if not success: raise ValueError("All stitch attempts failed")
+            if all(chain_speed(normalize_chain(seg.get('actions'))) == 1.0 for seg in actions):
+                cut_spans = [[float(seg['start']), float(seg['end'])] for seg in actions]
         
         else:
             # LEGACY TOOL MODE
-            probe = ffmpeg.probe(input_path)
-            has_audio = any(s['codec_type'] == 'audio' for s in probe['streams'])
-            
-            stream = ffmpeg.input(input_path)
-            video = stream.video
-            audio = stream.audio if has_audio else None
-
-            # 1. Timeline Pre-Trim
-            if clip_start > 0 or (clip_duration and clip_duration > 0):
-                print(f"--- Pre-Trimming: {clip_start}s ---")
-                trim_end = clip_start + clip_duration if clip_duration else None
-                video = video.trim(start=clip_start, end=trim_end).setpts('PTS-STARTPTS')
-                if has_audio:
-                    audio = audio.filter_('atrim', start=clip_start, end=trim_end).filter_('asetpts', 'PTS-STARTPTS')
-
-            # 2. Apply Actions
+            info = await probe(input_path)
+            has_audio = any(s['codec_type'] == 'audio' for s in info['streams'])
+            src_dur = float(info['format'].get('duration', 0) or 0)
+            expected_dur = clip_duration if clip_duration else max(0.0, src_dur - clip_start)
+
             for action in actions:
-                tool = action.get("tool")
-                params = action.get("params", {})
-                print(f"--- Tool: {tool} {params} ---")
-
-                if tool == "speed":
-                    factor = float(params.get("factor", 1.0))
-                    video = video.filter('setpts', f'{1/factor}*PTS')
-                    
-                    if has_audio:
-                        # Atempo chaining for extreme speeds
-                        curr = factor
-                        while curr > 2.0:
-                            audio = audio.filter('atempo', 2.0); curr /= 2.0
-                        while curr < 0.5:
-                            audio = audio.filter('atempo', 0.5); curr /= 0.5
-                        if curr != 1.0:
-                            audio = audio.filter('atempo', curr)
+                print(f"--- Tool: {action.get('tool')} {action.get('params', {})} ---")
+            speed = _speed_factor(actions)
+            expected_dur /= speed
+
+            src_end = clip_start + clip_duration if clip_duration else src_dur
+            rendered = False
+
+            # Incremental: unchanged pieces of the range come from the segment cache
+            if use_segment_cache(expected_dur, 'libx264'):
+                try:
+                    rendered = await render_cached_segments(
+                        input_path, output_path, [{"start": clip_start, "end": src_end}], actions, on_progress)
+                except Exception as e:
+                    print(f"⚠️ Segment cache render failed ({e}). Rendering in one pass...")
+
+            # Long CPU renders: keyframe-aligned chunks of the pre-trimmed range, encoded in parallel
+            if not rendered and should_chunk(expected_dur, 'libx264'):
+                ranges = split_range(clip_start, src_end, await get_keyframes(input_path))
+                if len(ranges) > 1:
+                    def chunk_builder(chunk_start, chunk_end):
+                        def build(chunk_path, threads):
+                            chunk = ffmpeg.input(input_path, ss=chunk_start, t=chunk_end - chunk_start)
+                            v, _ = _apply_actions(chunk.video, None, actions)
+                            return ffmpeg.output(v, chunk_path, vcodec='libx264', preset='ultrafast',
+                                                 threads=threads, f='mpegts')
+                        return build
+
+                    durations = [(b - a) / speed for a, b in ranges]
+                    audio = (lambda path: render_audio(input_path, [(clip_start, src_end, speed)], path)) if has_audio else None
+                    rendered = await encode_chunks(output_path, [chunk_builder(a, b) for a, b in ranges], durations,
+                                                   on_progress, audio=audio)
+
+            if not rendered:
+                # 1. Timeline Pre-Trim: input seeking, so nothing before clip_start is decoded
+                seek = {}
+                if clip_start > 0:
+                    print(f"--- Pre-Trimming: {clip_start}s ---")
+                    seek['ss'] = clip_start
+                if clip_duration and clip_duration > 0:
+                    seek['t'] = clip_duration
+                stream = ffmpeg.input(input_path, **seek)
+                video = stream.video.setpts('PTS-STARTPTS')
+                audio = stream.audio.filter_('asetpts', 'PTS-STARTPTS') if has_audio else None
+
+                # 2. Apply Actions
+                video, audio = _apply_actions(video, audio, actions)
+
+                # 3. Render (Try CPU Safe Mode first for tools)
+                # Legacy tools are less intensive, so libx264 is safer and fine
+                job = ffmpeg.output(
+                    video, 
+                    audio if has_audio else video, # fallback if no audio stream
+                    output_path, 
+                    vcodec='libx264', 
+                    preset='ultrafast', 
+                    movflags='faststart'
+                )
                 
-                elif tool == "filter":
-                    ftype = params.get("type", "").lower()
-                    if ftype == "grayscale": video = video.filter('hue', s=0)
-                    elif ftype == "sepia": video = video.filter('colorchannelmixer', rr=0.393, rg=0.769, rb=0.189, gr=0.349, gg=0.686, gb=0.168, br=0.272, bg=0.534, bb=0.131)
-                    elif ftype == "warm": video = video.filter('eq', saturation=1.3, contrast=1.1, gamma_r=1.1)
-
-            # 3. Render (Try CPU Safe Mode first for tools)
-            # Legacy tools are less intensive, so libx264 is safer and fine
-            job = ffmpeg.output(
-                video, 
-                audio if has_audio else video, # fallback if no audio stream
-                output_path, 
-                vcodec='libx264', 
-                preset='ultrafast', 
-                movflags='faststart'
-            )
-            
-            # If no audio, remove audio mapping
-            if not has_audio:
-                job = ffmpeg.output(video, output_path, vcodec='libx264', preset='ultrafast')
+                # If no audio, remove audio mapping
+                if not has_audio:
+                    job = ffmpeg.output(video, output_path, vcodec='libx264', preset='ultrafast')
 
-            job.run(overwrite_output=True, quiet=True)
+                await run_ffmpeg(job, on_progress=on_progress, duration=expected_dur)
+
+            if speed == 1.0:
+                cut_spans = [[clip_start, src_end]]
 
         # Output Duration Check
         if os.path.exists(output_path):
-            probe = ffmpeg.probe(output_path)
-            new_dur = float(probe['format']['duration'])
+            info = await probe(output_path)
+            new_dur = float(info['format']['duration'])
+            if cut_spans:
+                try:
+                    await record_cut(input_path, output_path, cut_spans)
+                except Exception as e:
+                    print(f"⚠️ Lineage not recorded: {e}")
             return {"path": output_path, "duration": new_dur}
         else:
             return None
@@ -203,58 +473,72 @@ async def process_video(input_path: str, actions: list, clip_start: float = 0.0,
         return None
 
 # ==========================================
-# 🎬 STITCH VIDEOS (Robust Audio Handling)
+# 🎬 STITCH VIDEOS (Timeline Compiler, Single Pass)
 # ==========================================
-async def stitch_videos(clips: list):
+async def stitch_videos(project, on_progress=None):
+    """
+    Renders a project (legacy clip list or full timeline, see timeline.normalize_project)
+    in one decode/encode pass: trims, normalization, gaps and mixed audio tracks.
+    """
     output_filename = f"final_render_{uuid.uuid4()}.mp4"
     output_path = os.path.join(TEMP_DIR, output_filename)
-    
-    try:
-        inputs = []
-        valid_clips = []
-        
-        # 1. Filter Valid Files
-        for clip in clips:
-            p = os.path.join(TEMP_DIR, clip["filename"])
-            if os.path.exists(p):
-                valid_clips.append(p)
-        
-        if not valid_clips: return None
-
-        # 2. Create File List for Demuxer (Safer than filter complex for simple joins)
-        # This prevents resolution mismatch crashing
-        list_path = os.path.join(TEMP_DIR, f"list_{uuid.uuid4()}.txt")
-        with open(list_path, 'w') as f:
-            for path in valid_clips:
-                f.write(f"file '{path}'\n")
-
-        # 3. Run Concat Demuxer
-        # Note: This requires all clips to have same Codec/Resolution.
-        # If your clips vary wildly, we must use the Filter Complex method below.
-        # Assuming clips processed by this engine are uniform-ish.
-        
-        print(f"🧵 Stitching {len(valid_clips)} clips...")
-        
-        (
-            ffmpeg
-            .input(list_path, format='concat', safe=0)
-            .output(output_path, c='copy') # Stream copy = Instant render
-            .run(overwrite_output=True, quiet=True)
-        )
-        
-        os.remove(list_path)
-        return output_path
+    project = normalize_project(project)
 
-    except Exception as e:
-        print(f"Simple Stitch Failed: {e}. Trying Re-encode Stitch...")
-        
-        # Fallback: Robust Re-encode Stitch
-        try:
-            inputs = [ffmpeg.input(p) for p in valid_clips]
-            # Simple Video Concat (Drop Audio if complex)
-            # This is a last resort fallback
-            joined = ffmpeg.concat(*[i.video for i in inputs], v=1, a=0).node
-            ffmpeg.output(joined[0], output_path, preset='ultrafast').run(overwrite_output=True)
+    video_codec, preset = await asyncio.to_thread(get_hardware_encoder)
+    print(f"🧵 Rendering timeline: {len(project['clips'])} clips, {len(project['audio'])} audio items ({video_codec})...")
+    try:
+        if await render_timeline(project, output_path, video_codec, preset, on_progress):
             return output_path
-        except:
+        return None
+    except ffmpeg.Error as e:
+        if video_codec == 'libx264':
+            print(f"Timeline Render Failed: {e.stderr.decode(errors='ignore')[-500:] if e.stderr else e}")
             return None
+        # Self-healing: retry the same graph on the CPU encoder
+        print("⚠️ HW Encoder Failed! Switching to CPU (libx264)...")
+    except Exception as e:
+        print(f"Timeline Render Failed: {e}")
+        return None
+
+    try:
+        if await render_timeline(project, output_path, 'libx264', 'ultrafast', on_progress):
+            return output_path
+    except Exception as e:
+        print(f"Timeline Render Failed: {e}")
+    return None
+
+# =========================
+# LOCAL BENCHMARK (preview vs full render)
+# =========================
+if __name__ == "__main__":
+    # Usage (from backend/): python -m services.video_engine [duration_seconds]
+    import sys
+    import time
+
+    async def bench():
+        global SEGMENT_CACHE, SMART_CUT
+        SEGMENT_CACHE = SMART_CUT = False # measure a real full re-encode, not a cache hit / GOP copy
+
+        duration = float(sys.argv[1]) if len(sys.argv) > 1 else 120.0
+        src = os.path.join(TEMP_DIR, f"bench_1080p_{int(duration)}s.mp4")
+        if not os.path.exists(src):
+            print(f"🧪 Generating synthetic 1080p {duration:.0f}s input...")
+            video = ffmpeg.input("testsrc2=size=1920x1080:rate=30", f='lavfi', t=duration)
+            audio = ffmpeg.input("sine=frequency=440:sample_rate=48000", f='lavfi', t=duration)
+            await run_ffmpeg(ffmpeg.output(video, audio, src, vcodec='libx264', preset='ultrafast', acodec='aac'))
+
+        # A typical AI plan: keep three spans spread over the clip, one of them sped up
+        third = duration / 3
+        plan = [
+            {"start": 0.0, "end": third * 0.8},
+            {"start": third, "end": third * 1.8, "actions": [{"tool": "speed", "params": {"factor": 1.5}}]},
+            {"start": third * 2, "end": duration - 1},
+        ]
+        for label, preview in [("full", False), ("preview", True)]:
+            started = time.perf_counter()
+            result = await process_video(src, plan, preview=preview)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(result["path"]) / 1e6 if result else 0
+            print(f"{label:>8}: {elapsed:6.2f}s  {size:6.1f} MB  -> {result and result['path']}")
+
+    asyncio.run(bench())
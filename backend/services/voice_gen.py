@@ -1,70 +1,129 @@
 # backend/services/voice_gen.py
 import os
 import uuid
+import json
 import hashlib
-from elevenlabs.client import ElevenLabs
-from elevenlabs import VoiceSettings
 from dotenv import load_dotenv
+from services.registry import get_elevenlabs
+from services.disk_cache import DiskCache
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Client
-client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
-
 # Configuration
 TEMP_DIR = "temp_storage"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-AUDIO_CACHE = {}
+# Voice
+VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"   # 'Adam' (Great narrator voice)
+MODEL_ID = "eleven_turbo_v2_5"      # 🚀 UPGRADE: Newer, faster, more natural
+OUTPUT_FORMAT = "mp3_44100_128"
+VOICE_SETTINGS = {
+    "stability": 0.4,        # Lower = more emotion/variation
+    "similarity_boost": 0.8, # Higher = clearer voice
+}
 
-def generate_voice_reply(text: str):
+# Persistent LRU of synthesized replies, shared by every worker.
+# Their /files URLs go out to clients, so entries don't own the MP3s (same as the SFX index):
+# eviction only forgets the index row, and a later miss re-adopts the file that is still there.
+TTS_CACHE_SIZE = int(os.getenv("VOXEDIT_TTS_CACHE_SIZE", "5000"))
+tts_cache = DiskCache("tts_index", max_entries=TTS_CACHE_SIZE)
+
+def tts_cache_key(text: str, voice_id: str = VOICE_ID, model_id: str = MODEL_ID,
+                  settings: dict = VOICE_SETTINGS, output_format: str = OUTPUT_FORMAT) -> str:
+    # Any change to the voice, model or settings must miss, not replay old audio
+    payload = json.dumps([text, voice_id, model_id, settings, output_format], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def tts_cache_stats() -> dict:
+    return tts_cache.stats()
+
+# Bytes per chunk when replaying a cached reply through the streaming endpoint
+STREAM_CHUNK = 16 * 1024
+
+def reply_path(key: str) -> str:
+    return os.path.join(TEMP_DIR, f"reply_{key[:32]}.mp3")
+
+def _lookup(key: str):
+    # Index hit whose file still exists, else a finished reply left on disk by an evicted entry
+    cached = tts_cache.get(key)
+    if cached and os.path.exists(cached["path"]):
+        return cached["path"]
+    filepath = reply_path(key)
+    if os.path.exists(filepath):
+        tts_cache.put(key, {"path": filepath})
+        return filepath
+    return None
+
+def cached_voice_reply(text: str):
     """
-    Generates conversational audio using ElevenLabs Turbo v2.5.
-    Includes caching for zero-latency repeats.
+    Path of an already synthesized reply for `text`, or None.
     """
-    if not text:
-        return None
+    return _lookup(tts_cache_key(text)) if text else None
+
+def stream_voice_reply(text: str):
+    """
+    Yields MP3 chunks as soon as ElevenLabs produces them, writing them to the cache file
+    at the same time; the entry is only published once the stream completed.
+    Cached replies are replayed from disk. Blocking generator (StreamingResponse runs it in a thread).
+    """
+    key = tts_cache_key(text)
+    cached = _lookup(key)
+    if cached:
+        print(f"⚡ Cache Hit! Serving existing audio for: '{text[:20]}...'")
+        with open(cached, "rb") as f:
+            while chunk := f.read(STREAM_CHUNK):
+                yield chunk
+        return
+
+    print(f"🎙️ Generating New Voice for: '{text[:30]}...'")
+
+    # GENERATE STREAM (Using Turbo 2.5; client is created on first use)
+    from elevenlabs import VoiceSettings
+
+    audio_stream = get_elevenlabs().text_to_speech.convert(
+        text=text,
+        voice_id=VOICE_ID,
+        model_id=MODEL_ID,
+        output_format=OUTPUT_FORMAT,
+        voice_settings=VoiceSettings(**VOICE_SETTINGS)
+    )
 
+    # Named by key; temp + rename so concurrent writers never expose a partial MP3
+    filepath = reply_path(key)
+    tmp_path = f"{filepath}.{uuid.uuid4().hex}.part"
+    completed = False
     try:
-        # 1. CHECK CACHE (Instant Return)
-        # Create a unique hash for the text to use as a key
-        text_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-        
-        if text_hash in AUDIO_CACHE:
-            cached_path = AUDIO_CACHE[text_hash]
-            if os.path.exists(cached_path):
-                print(f"⚡ Cache Hit! Serving existing audio for: '{text[:20]}...'")
-                return cached_path
-
-        print(f"🎙️ Generating New Voice for: '{text[:30]}...'")
-
-        # 2. GENERATE STREAM (Using Turbo 2.5)
-        audio_stream = client.text_to_speech.convert(
-            text=text,
-            voice_id="JBFqnCBsd6RMkjVDRZzb", # 'Adam' (Great narrator voice)
-            model_id="eleven_turbo_v2_5",    # 🚀 UPGRADE: Newer, faster, more natural
-            output_format="mp3_44100_128",
-            voice_settings=VoiceSettings(
-                stability=0.4,       # Lower = more emotion/variation
-                similarity_boost=0.8 # Higher = clearer voice
-            )
-        )
-
-        # 3. SAVE FILE
-        filename = f"reply_{uuid.uuid4()}.mp3"
-        filepath = os.path.join(TEMP_DIR, filename)
-        
-        with open(filepath, "wb") as f:
+        with open(tmp_path, "wb") as f:
             for chunk in audio_stream:
                 if chunk:
                     f.write(chunk)
-        
-        # 4. UPDATE CACHE
-        AUDIO_CACHE[text_hash] = filepath
-        
+                    yield chunk
+        os.replace(tmp_path, filepath)
+        tts_cache.put(key, {"path": filepath, "chars": len(text)})
+        completed = True
         print(f" Voice generated: {filepath}")
-        return filepath
+    finally:
+        # Client went away mid-stream (or the API failed): don't keep half a reply
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def generate_voice_reply(text: str):
+    """
+    Generates conversational audio using ElevenLabs Turbo v2.5.
+    Includes caching for zero-latency repeats (persistent, shared across workers).
+    """
+    if not text:
+        return None
+
+    try:
+        cached = cached_voice_reply(text)
+        if cached:
+            print(f"⚡ Cache Hit! Serving existing audio for: '{text[:20]}...'")
+            return cached
+        for _ in stream_voice_reply(text):
+            pass
+        return reply_path(tts_cache_key(text))
 
     except Exception as e:
         print(f" ElevenLabs Error: {e}")
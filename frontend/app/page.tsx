@@ -270,11 +270,21 @@ export default function EditorPage() {
           alert("No clips to export!");
           return;
       }
-      const sortedClips = [...videoTrack.clips].sort((a, b) => a.start - b.start);
-      const clipData = sortedClips.map(c => ({
-          filename: c.url?.split("/").pop() || "",
-          duration: c.duration
-      }));
+      // Full timeline: the backend compiles trims, gaps and audio tracks into one render
+      const toItem = (c: Clip, muted: boolean) => ({
+          url: c.url || "",
+          start: c.start,
+          offset: c.offset || 0,
+          duration: c.duration,
+          volume: c.volume ?? 1,
+          muted
+      });
+      const audioTrack = tracks.find(t => t.type === 'audio');
+      const clipData = {
+          // A linked clip's sound comes from its extracted audio clip instead
+          clips: [...videoTrack.clips].sort((a, b) => a.start - b.start).map(c => toItem(c, !!videoTrack.muted || !!c.isLinked)),
+          audio: audioTrack && !audioTrack.muted ? audioTrack.clips.map(c => toItem(c, false)) : []
+      };
 
       setIsExporting(true);
       try {